@@ -0,0 +1,28 @@
+"""Add (device_id, pred_ts) index on forecast_8h
+
+Revision ID: 5c1e9a7d2b40
+Revises: 2081a5fc89b5
+Create Date: 2026-10-17 09:12:44.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e9a7d2b40'
+down_revision: Union[str, Sequence[str], None] = '2081a5fc89b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_forecast_device_predts', 'forecast_8h', ['device_id', 'pred_ts'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_forecast_device_predts', table_name='forecast_8h')
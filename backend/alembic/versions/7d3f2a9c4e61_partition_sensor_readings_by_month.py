@@ -0,0 +1,186 @@
+"""Partition sensor_readings by month on ts (PostgreSQL)
+
+Converts sensor_readings into a declaratively RANGE-partitioned table with
+one partition per calendar month (UTC), copies existing rows across, and
+installs the maintenance functions:
+
+  sensor_readings_ensure_partitions(from_ts, to_ts)  create missing months
+  sensor_readings_drop_partitions(retain_months)     drop whole old months
+
+The primary key becomes (id, ts) because a partitioned table's unique
+constraints must include the partition key. There is deliberately no
+DEFAULT partition: it would stop the planner from scanning partitions in
+ts order, which is what lets latest-N queries stop at the newest one.
+Instead, ingest creates the month of a reading that falls outside the
+existing partitions and retries the write (main._write_readings).
+
+Other dialects are left unchanged.
+
+Revision ID: 7d3f2a9c4e61
+Revises: 5c1e9a7d2b40
+Create Date: 2026-10-17 14:03:27.551930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3f2a9c4e61'
+down_revision: Union[str, Sequence[str], None] = '5c1e9a7d2b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+COLUMNS = "id, device_id, device_key, ts, temperature, humidity, wind_speed, radiation, precipitation, raw"
+
+INDEXES = {
+    "idx_device_ts": "device_id, ts",
+    "idx_devicekey_ts": "device_key, ts",
+    "ix_sensor_readings_device_id": "device_id",
+    "ix_sensor_readings_device_key": "device_key",
+}
+
+TABLE_BODY = """
+    id INTEGER NOT NULL DEFAULT nextval('sensor_readings_id_seq'),
+    device_id INTEGER NOT NULL CONSTRAINT sensor_readings_device_id_fkey
+        REFERENCES devices (id) ON DELETE CASCADE,
+    device_key VARCHAR(128) NOT NULL,
+    ts TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    temperature DOUBLE PRECISION,
+    humidity DOUBLE PRECISION,
+    wind_speed DOUBLE PRECISION,
+    radiation DOUBLE PRECISION,
+    precipitation DOUBLE PRECISION,
+    raw JSON,
+"""
+
+FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION sensor_readings_partition_name(month_start date)
+    RETURNS text LANGUAGE sql IMMUTABLE AS $$
+        SELECT 'sensor_readings_' || to_char(month_start, '"p"YYYY"_"MM')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION sensor_readings_ensure_partitions(from_ts timestamptz, to_ts timestamptz)
+    RETURNS integer LANGUAGE plpgsql AS $$
+    DECLARE
+        month_start date := date_trunc('month', from_ts AT TIME ZONE 'UTC')::date;
+        last_month date := date_trunc('month', to_ts AT TIME ZONE 'UTC')::date;
+        part text;
+        created integer := 0;
+    BEGIN
+        WHILE month_start <= last_month LOOP
+            part := sensor_readings_partition_name(month_start);
+            IF to_regclass(part) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF sensor_readings FOR VALUES FROM (%L) TO (%L)',
+                    part,
+                    month_start::timestamp AT TIME ZONE 'UTC',
+                    (month_start + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+                );
+                created := created + 1;
+            END IF;
+            month_start := (month_start + interval '1 month')::date;
+        END LOOP;
+        RETURN created;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION sensor_readings_drop_partitions(retain_months integer)
+    RETURNS integer LANGUAGE plpgsql AS $$
+    DECLARE
+        cutoff date := (date_trunc('month', now() AT TIME ZONE 'UTC')
+                        - make_interval(months => retain_months))::date;
+        part record;
+        dropped integer := 0;
+    BEGIN
+        IF retain_months < 1 THEN
+            RAISE EXCEPTION 'retain_months must be at least 1, got %', retain_months;
+        END IF;
+        FOR part IN
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'sensor_readings'::regclass
+              AND c.relname ~ '^sensor_readings_p[0-9]{4}_[0-9]{2}$'
+              AND to_date(substr(c.relname, 18), 'YYYY_MM') < cutoff
+            ORDER BY c.relname
+        LOOP
+            EXECUTE format('ALTER TABLE sensor_readings DETACH PARTITION %I', part.relname);
+            EXECUTE format('DROP TABLE %I', part.relname);
+            dropped := dropped + 1;
+        END LOOP;
+        RETURN dropped;
+    END
+    $$
+    """,
+]
+
+
+def _rename_indexes(suffix_from: str, suffix_to: str) -> None:
+    for name in INDEXES:
+        op.execute(f"ALTER INDEX {name}{suffix_from} RENAME TO {name}{suffix_to}")
+
+
+def _create_indexes() -> None:
+    for name, columns in INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON sensor_readings ({columns})")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    # Move the old table (and its index names) out of the way
+    op.execute("ALTER TABLE sensor_readings RENAME TO sensor_readings_legacy")
+    op.execute("ALTER TABLE sensor_readings_legacy RENAME CONSTRAINT sensor_readings_pkey TO sensor_readings_legacy_pkey")
+    _rename_indexes("", "_legacy")
+    op.execute("ALTER SEQUENCE sensor_readings_id_seq OWNED BY NONE")
+
+    op.execute(f"CREATE TABLE sensor_readings ({TABLE_BODY} PRIMARY KEY (id, ts)) PARTITION BY RANGE (ts)")
+    op.execute("ALTER SEQUENCE sensor_readings_id_seq OWNED BY sensor_readings.id")
+    for ddl in FUNCTIONS:
+        op.execute(ddl)
+
+    # Partitions for every month holding data, plus MONTHS_AHEAD of headroom
+    op.execute(f"""
+        SELECT sensor_readings_ensure_partitions(
+            COALESCE((SELECT min(ts) FROM sensor_readings_legacy), now()),
+            GREATEST(
+                (SELECT max(ts) FROM sensor_readings_legacy),
+                now() + interval '{MONTHS_AHEAD} months'
+            )
+        )
+    """)
+    op.execute(f"INSERT INTO sensor_readings ({COLUMNS}) SELECT {COLUMNS} FROM sensor_readings_legacy")
+    _create_indexes()
+    op.execute("DROP TABLE sensor_readings_legacy")
+    op.execute("ANALYZE sensor_readings")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.execute("ALTER TABLE sensor_readings RENAME TO sensor_readings_partitioned")
+    op.execute("ALTER TABLE sensor_readings_partitioned RENAME CONSTRAINT sensor_readings_pkey TO sensor_readings_partitioned_pkey")
+    _rename_indexes("", "_partitioned")
+    op.execute("ALTER SEQUENCE sensor_readings_id_seq OWNED BY NONE")
+
+    op.execute(f"CREATE TABLE sensor_readings ({TABLE_BODY} CONSTRAINT sensor_readings_pkey PRIMARY KEY (id))")
+    op.execute("ALTER SEQUENCE sensor_readings_id_seq OWNED BY sensor_readings.id")
+    op.execute(f"INSERT INTO sensor_readings ({COLUMNS}) SELECT {COLUMNS} FROM sensor_readings_partitioned")
+    _create_indexes()
+    op.execute("DROP TABLE sensor_readings_partitioned")
+
+    op.execute("DROP FUNCTION IF EXISTS sensor_readings_drop_partitions(integer)")
+    op.execute("DROP FUNCTION IF EXISTS sensor_readings_ensure_partitions(timestamptz, timestamptz)")
+    op.execute("DROP FUNCTION IF EXISTS sensor_readings_partition_name(date)")
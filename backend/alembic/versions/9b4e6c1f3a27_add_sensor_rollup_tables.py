@@ -0,0 +1,63 @@
+"""Add hourly/daily sensor rollup tables and the rollup watermark
+
+Revision ID: 9b4e6c1f3a27
+Revises: 7d3f2a9c4e61
+Create Date: 2026-10-17 23:40:12.306518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4e6c1f3a27'
+down_revision: Union[str, Sequence[str], None] = '7d3f2a9c4e61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FEATURES = ['temperature', 'humidity', 'wind_speed', 'radiation', 'precipitation']
+
+ROLLUPS = {
+    'sensor_rollup_1h': 'idx_rollup_1h_devicekey_bucket',
+    'sensor_rollup_1d': 'idx_rollup_1d_devicekey_bucket',
+}
+
+
+def _feature_columns():
+    for f in FEATURES:
+        yield sa.Column(f'{f}_min', sa.Float(), nullable=True)
+        yield sa.Column(f'{f}_max', sa.Float(), nullable=True)
+        yield sa.Column(f'{f}_sum', sa.Float(), nullable=True)
+        yield sa.Column(f'{f}_count', sa.Integer(), nullable=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, index in ROLLUPS.items():
+        op.create_table(table,
+        sa.Column('device_id', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('device_key', sa.String(length=128), nullable=False),
+        sa.Column('n', sa.Integer(), nullable=False),
+        *_feature_columns(),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('device_id', 'bucket')
+        )
+        op.create_index(index, table, ['device_key', 'bucket'], unique=False)
+
+    op.create_table('rollup_watermarks',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('last_id', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rollup_watermarks')
+    for table, index in ROLLUPS.items():
+        op.drop_index(index, table_name=table)
+        op.drop_table(table)
@@ -0,0 +1,39 @@
+"""Add backfill_checkpoints
+
+backfill.py records each source file's progress here, in the same
+transaction as the chunk it loaded, so a resumed run never reloads a
+committed chunk.
+
+Revision ID: c3a8f51d92e7
+Revises: 9b4e6c1f3a27
+Create Date: 2026-10-18 01:12:44.918203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a8f51d92e7'
+down_revision: Union[str, Sequence[str], None] = '9b4e6c1f3a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('backfill_checkpoints',
+    sa.Column('source', sa.String(length=1024), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('mtime', sa.Float(), nullable=False),
+    sa.Column('rows_done', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('source')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('backfill_checkpoints')
@@ -8,12 +8,88 @@ class Settings(BaseSettings):
     BACKEND_PORT: int = 8000
 
     DATABASE_URL: Optional[str] = None
+    # Connection pool (ignored for SQLite)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # -1 never recycles
+    DB_POOL_PRE_PING: bool = True
+    # asyncpg prepared statement cache; only used when DB_PGBOUNCER=false
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Set false when connecting straight to PostgreSQL to enable the statement
+    # cache. None (default) takes ?pgbouncer= from the URL, else assumes a
+    # transaction-pooling proxy and disables prepared statements.
+    DB_PGBOUNCER: Optional[bool] = None
+    # Optional streaming replica for GET endpoints; reads fall back to the
+    # primary while its replay lag exceeds DB_REPLICA_MAX_LAG_SECONDS
+    DATABASE_READ_URL: Optional[str] = None
+    DB_REPLICA_MAX_LAG_SECONDS: float = 10.0
+    DB_REPLICA_CHECK_INTERVAL_SECONDS: float = 5.0
     MODEL_SERVER_URL: str = "http://localhost:8001"
+    MODEL_CLIENT_TIMEOUT: float = 15.0
+    MODEL_CLIENT_MAX_CONNECTIONS: int = 20
+    MODEL_CLIENT_MAX_KEEPALIVE: int = 10
+    MODEL_CLIENT_KEEPALIVE_EXPIRY: float = 30.0
+    MODEL_CLIENT_HTTP2: bool = False
     REDIS_URL: str = "redis://localhost:6379"
+    # auto | msgpack | orjson | json | pickle (pickle only for trusted, private Redis).
+    # auto picks msgpack: a ForecastOut takes ~0.8 KB against ~0.9 KB as pickle
+    # and ~1.2 KB as orjson, which is faster but ~30% larger than pickle
+    # (scripts/bench_cache_codec.py). Cached values must be dicts, lists, str,
+    # numbers, bools, None, datetimes/dates or ndarrays; tuples come back as
+    # lists, and with orjson/json datetimes come back as ISO strings.
+    CACHE_CODEC: str = "auto"
+    CACHE_SCAN_COUNT: int = 500
+    CACHE_UNLINK_CHUNK: int = 100
+    # In-process L1 tier in front of Redis, kept coherent over pub/sub
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_MAX_ENTRIES: int = 4096
+    CACHE_L1_MAX_BYTES: int = 32 * 1024 * 1024
+    CACHE_L1_TTL_SECONDS: float = 30.0
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
     SECRET_KEY: str = "your-secret-key-change-in-production"
 
     POLL_MS: int = 300_000
 
+    INGEST_BATCH_MAX_ROWS: int = 10_000
+    # GET /api/v1/readings page size (default / max) and server-side fetch batch.
+    # Longer exports page with next_cursor, within the endpoint's rate limit.
+    READINGS_PAGE_ROWS: int = 5_000
+    READINGS_PAGE_MAX_ROWS: int = 10_000
+    READINGS_FETCH_ROWS: int = 2_000
+    # Process-local device_id -> pk cache; last_seen is refreshed at most this often
+    DEVICE_CACHE_MAX_ENTRIES: int = 100_000
+    DEVICE_LAST_SEEN_REFRESH_SECONDS: float = 60.0
+
+    # Monthly sensor_readings partitions (PostgreSQL, migration 7d3f2a9c4e61)
+    SENSOR_PARTITION_MONTHS_AHEAD: int = 3
+    # Whole months kept before partitions are dropped; 0 keeps everything
+    SENSOR_RETENTION_MONTHS: int = 0
+    SENSOR_PARTITION_MAINTENANCE_INTERVAL_SECONDS: float = 21600.0
+
+    # Hourly/daily rollups (rollups.py); compaction folds new readings on this interval
+    ROLLUP_COMPACTION_INTERVAL_SECONDS: float = 60.0
+    ROLLUP_BATCH_ROWS: int = 100_000
+    # Ids re-scanned behind the watermark for transactions that committed late
+    ROLLUP_ID_SLACK: int = 5_000
+    # /history with resolution=auto switches from hourly to daily rollups past this span
+    ROLLUP_HOURLY_MAX_DAYS: int = 14
+
+    FORECAST_DEBOUNCE_SECONDS: float = 60.0
+    FORECAST_BATCH_SIZE: int = 256
+
+    # Both /predict routes (public and authenticated) serve the newest stored
+    # Forecast8h while it is younger than this (0 = always re-predict). The
+    # stored forecast is not invalidated by ingest, so it can be up to this
+    # old and predate readings that have arrived since.
+    FORECAST_READ_TTL_SECONDS: int = 900
+
+    FORECAST_CACHE_TTL_SECONDS: int = 600
+    FORECAST_CACHE_MAX_ENTRIES: int = 4096
+
+    WINDOW_BUFFER_MAX_DEVICES: int = 10_000
+    WINDOW_BUFFER_TTL_SECONDS: float = 300.0
+
     CORS_ORIGINS: List[str] = [
         "http://localhost:5173",
         "http://127.0.0.1:5173",
@@ -0,0 +1,299 @@
+"""
+Bulk backfill of historical readings into sensor_readings.
+
+Streams a CSV or Parquet file in chunks. On PostgreSQL each chunk goes in
+with asyncpg's COPY (copy_records_to_table); other databases use batched
+executemany INSERTs. Devices are created in bulk up front, progress is
+reported in rows/sec, and a backfill_checkpoints row, written in the
+same transaction as each chunk, lets an interrupted load resume after the
+last committed chunk without loading any of it twice. Each chunk's ts
+range is then refreshed in the hourly/daily rollups.
+
+Accepted layouts:
+  * NASA POWER hourly exports (YEAR, MO, DY, HR, T2M, RH2M, WS2M,
+    ALLSKY_SFC_SW_DWN, PRECTOTCORR), with or without the -BEGIN HEADER-
+    block. Fill values (-999) become NULL.
+  * Native columns: ts, temperature, humidity, wind_speed, radiation,
+    precipitation, and optionally device_id / lat / lon.
+
+    python backfill.py data/training/POWER_Point_Hourly_2001_2025_combined.csv \\
+        --device-id power-point-001 --lat 12.97 --lon 77.59
+
+Parquet input needs pyarrow.
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import DateTime, bindparam, insert, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+import crud
+import rollups
+from database import AsyncSessionLocal, engine
+from db_models import SensorReading
+from maintenance import ensure_partitions, is_partitioned
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+FEATURES = ["temperature", "humidity", "wind_speed", "radiation", "precipitation"]
+
+POWER_COLUMNS = {
+    "T2M": "temperature",
+    "RH2M": "humidity",
+    "WS2M": "wind_speed",
+    "ALLSKY_SFC_SW_DWN": "radiation",
+    "PRECTOTCORR": "precipitation",
+}
+POWER_FILL_VALUE = -999.0
+
+COPY_COLUMNS = ["device_id", "device_key", "ts", *FEATURES]
+
+
+# =====================================================
+# READING THE SOURCE
+# =====================================================
+def _power_header_rows(path: str) -> int:
+    """Number of lines in a POWER '-BEGIN HEADER-' block (0 if absent)."""
+    with open(path, "r", errors="replace") as f:
+        first = f.readline()
+        if "-BEGIN HEADER-" not in first:
+            return 0
+        for n, line in enumerate(f, start=2):
+            if "-END HEADER-" in line:
+                return n
+    return 0
+
+
+def iter_chunks(path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    if path.endswith(".parquet"):
+        if pq is None:
+            raise RuntimeError("Reading Parquet requires pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows, skiprows=_power_header_rows(path))
+
+
+def normalize(df: pd.DataFrame, device_id: Optional[str], tz: str) -> pd.DataFrame:
+    """Map a source chunk onto device_id, ts and the five feature columns."""
+    if "YEAR" in df.columns:
+        parts = {"year": df["YEAR"], "month": df["MO"], "day": df["DY"], "hour": df["HR"]}
+        ts = pd.to_datetime(pd.DataFrame(parts))
+        out = pd.DataFrame({"ts": ts.dt.tz_localize(tz)})
+        for source, target in POWER_COLUMNS.items():
+            out[target] = df[source].replace(POWER_FILL_VALUE, np.nan) if source in df else np.nan
+    else:
+        out = pd.DataFrame({"ts": pd.to_datetime(df["ts"])})
+        if out["ts"].dt.tz is None:
+            out["ts"] = out["ts"].dt.tz_localize(tz)
+        for target in FEATURES:
+            out[target] = df[target] if target in df else np.nan
+
+    if "device_id" in df.columns:
+        out["device_id"] = df["device_id"].astype(str)
+    elif device_id:
+        out["device_id"] = device_id
+    else:
+        raise ValueError("Source has no device_id column; pass --device-id")
+
+    for coord in ("lat", "lon"):
+        if coord in df.columns:
+            out[coord] = df[coord]
+    return out
+
+
+def chunk_records(df: pd.DataFrame, pks: Dict[str, int]) -> List[Tuple]:
+    """Rows as tuples in COPY_COLUMNS order, NaN -> None."""
+    features = df[FEATURES].astype("float64")
+    values = features.astype(object).where(features.notna(), None)
+    return list(zip(
+        df["device_id"].map(pks),
+        df["device_id"],
+        df["ts"].dt.to_pydatetime(),
+        *(values[c] for c in FEATURES),
+    ))
+
+
+# =====================================================
+# CHECKPOINTS
+# =====================================================
+def _source_fingerprint(path: str) -> Dict:
+    st = os.stat(path)
+    return {"source": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime}
+
+
+async def load_checkpoint(path: str) -> int:
+    """Rows already committed from this exact file (0 if none or stale)."""
+    fingerprint = _source_fingerprint(path)
+    async with engine.connect() as conn:
+        res = await conn.execute(
+            text("SELECT size, mtime, rows_done FROM backfill_checkpoints WHERE source = :source"),
+            {"source": fingerprint["source"]},
+        )
+        row = res.first()
+    if row is None:
+        return 0
+    if (row.size, row.mtime) != (fingerprint["size"], fingerprint["mtime"]):
+        print(f"Checkpoint for {path} is for a different version of the file, starting over")
+        return 0
+    return int(row.rows_done)
+
+
+async def _save_checkpoint(conn: AsyncConnection, path: str, rows_done: int):
+    """Upsert progress on ``conn``, inside the transaction of the chunk it covers."""
+    await conn.execute(
+        text("""
+            INSERT INTO backfill_checkpoints (source, size, mtime, rows_done, updated_at)
+            VALUES (:source, :size, :mtime, :rows_done, :updated_at)
+            ON CONFLICT (source) DO UPDATE SET
+                size = excluded.size, mtime = excluded.mtime,
+                rows_done = excluded.rows_done, updated_at = excluded.updated_at
+        """).bindparams(bindparam("updated_at", type_=DateTime(timezone=True))),
+        {**_source_fingerprint(path), "rows_done": rows_done, "updated_at": datetime.now(timezone.utc)},
+    )
+
+
+# =====================================================
+# WRITERS
+# =====================================================
+async def _copy_chunk(records: List[Tuple], path: str, rows_done: int):
+    """PostgreSQL: binary COPY through the asyncpg driver connection."""
+    async with engine.connect() as conn:
+        # Executed first so the COPY runs inside the transaction it opens
+        await _save_checkpoint(conn, path, rows_done)
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            SensorReading.__tablename__,
+            records=records,
+            columns=COPY_COLUMNS,
+        )
+        await conn.commit()
+
+
+async def _insert_chunk(records: List[Tuple], batch_rows: int, path: str, rows_done: int):
+    """Fallback: executemany INSERTs, one transaction per chunk."""
+    table = SensorReading.__table__
+    async with engine.begin() as conn:
+        await _save_checkpoint(conn, path, rows_done)
+        for i in range(0, len(records), batch_rows):
+            rows = [dict(zip(COPY_COLUMNS, r)) for r in records[i:i + batch_rows]]
+            await conn.execute(insert(table), rows)
+
+
+async def _ensure_devices(df: pd.DataFrame, lat: Optional[float], lon: Optional[float]) -> Dict[str, int]:
+    coords: Dict[str, crud.Coords] = {}
+    for device_id, group in df.groupby("device_id", sort=False):
+        dev_lat = group["lat"].iloc[0] if "lat" in group else lat
+        dev_lon = group["lon"].iloc[0] if "lon" in group else lon
+        coords[device_id] = (
+            None if pd.isna(dev_lat) else float(dev_lat),
+            None if pd.isna(dev_lon) else float(dev_lon),
+        )
+    async with AsyncSessionLocal() as session:
+        pks = await crud.upsert_devices(session, coords)
+        await session.commit()
+    return pks
+
+
+def _skip_rows(chunks: Iterator[pd.DataFrame], skip: int) -> Iterator[pd.DataFrame]:
+    for df in chunks:
+        if skip >= len(df):
+            skip -= len(df)
+            continue
+        if skip:
+            df = df.iloc[skip:]
+            skip = 0
+        yield df
+
+
+# =====================================================
+# BACKFILL
+# =====================================================
+async def backfill(
+    path: str,
+    device_id: Optional[str] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    tz: str = "UTC",
+    chunk_rows: int = 50_000,
+    batch_rows: int = 5_000,
+    restart: bool = False,
+) -> int:
+    """Load ``path`` into sensor_readings; returns the rows written by this run."""
+    done = 0 if restart else await load_checkpoint(path)
+    if done:
+        print(f"Resuming after {done:,} rows")
+
+    use_copy = engine.dialect.driver == "asyncpg"
+    async with engine.connect() as conn:
+        partitioned = await is_partitioned(conn)
+    print(f"Loading {path} via {'COPY' if use_copy else 'executemany'}")
+
+    pks: Dict[str, int] = {}
+    written = 0
+    started = time.perf_counter()
+    for source in _skip_rows(iter_chunks(path, chunk_rows), done):
+        df = normalize(source, device_id, tz)
+        first_ts, last_ts = df["ts"].min().to_pydatetime(), df["ts"].max().to_pydatetime()
+
+        new_devices = df[~df["device_id"].isin(pks.keys())]
+        if len(new_devices):
+            pks.update(await _ensure_devices(new_devices, lat, lon))
+
+        if partitioned:
+            # Historical months usually predate the maintained range
+            async with engine.begin() as conn:
+                await ensure_partitions(conn, first_ts, last_ts)
+
+        records = chunk_records(df, pks)
+        if use_copy:
+            await _copy_chunk(records, path, done + written + len(records))
+        else:
+            await _insert_chunk(records, batch_rows, path, done + written + len(records))
+        await rollups.refresh_range(first_ts, last_ts)
+
+        written += len(records)
+        elapsed = time.perf_counter() - started
+        print(f"  {done + written:>12,} rows   {written / elapsed:>10,.0f} rows/s")
+
+    elapsed = time.perf_counter() - started
+    rate = written / elapsed if elapsed else 0.0
+    print(f"Done: {written:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/s), {len(pks)} device(s)")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill sensor_readings from CSV or Parquet")
+    parser.add_argument("path", help="CSV or .parquet file")
+    parser.add_argument("--device-id", help="device for files without a device_id column")
+    parser.add_argument("--lat", type=float)
+    parser.add_argument("--lon", type=float)
+    parser.add_argument("--tz", default="UTC", help="timezone of naive timestamps (POWER: UTC or the LST zone)")
+    parser.add_argument("--chunk-rows", type=int, default=50_000, help="rows per COPY / transaction")
+    parser.add_argument("--batch-rows", type=int, default=5_000, help="rows per executemany (non-PostgreSQL)")
+    parser.add_argument("--restart", action="store_true", help="ignore the stored checkpoint and load from the start")
+    args = parser.parse_args()
+
+    asyncio.run(backfill(
+        args.path,
+        device_id=args.device_id,
+        lat=args.lat,
+        lon=args.lon,
+        tz=args.tz,
+        chunk_rows=args.chunk_rows,
+        batch_rows=args.batch_rows,
+        restart=args.restart,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,50 @@
+import asyncio
+import dataclasses
+import hashlib
+import inspect
 import json
-import pickle
-from typing import Optional, Any, Union
-from datetime import datetime, timedelta
-import aioredis
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from enum import Enum
+from typing import Optional, Any, Union, Tuple, Iterable, List, Dict, Callable, Awaitable
+from datetime import date, datetime, timedelta, time as time_of_day
+from uuid import UUID
+import numpy as np
+import redis.asyncio as aioredis
 import structlog
-from functools import wraps
+from fastapi import BackgroundTasks, Request
+from functools import lru_cache, partial, wraps
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app_config import settings
+from cache_codecs import CodecError, TaggedCodec, get_codec
+from metrics import update_cache_metrics
 
 logger = structlog.get_logger()
 
+# Compare-and-delete, so a worker whose lock expired can't drop a newer owner's
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
 class RedisCache:
     """Redis caching wrapper with serialization support."""
     
-    def __init__(self, redis_url: str = "redis://localhost:6379"):
+    def __init__(
+        self,
+        redis_url: str = "redis://localhost:6379",
+        codec: Optional[TaggedCodec] = None,
+    ):
         self.redis_url = redis_url
+        self.codec = codec or get_codec()
         self._redis = None
     
     async def connect(self):
@@ -32,38 +64,83 @@ class RedisCache:
     async def disconnect(self):
         """Close Redis connection."""
         if self._redis:
-            await self._redis.close()
+            await self._redis.aclose()
+            self._redis = None
+
+    @property
+    def available(self) -> bool:
+        """True once connect() reached Redis."""
+        return self._redis is not None
     
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache."""
+        return self._decode(key, await self._get_raw(key))
+
+    async def _get_raw(self, key: str) -> Optional[bytes]:
         if not self._redis:
             return None
-        
+
         try:
-            data = await self._redis.get(key)
-            if data:
-                return pickle.loads(data)
-            return None
+            return await self._redis.get(key)
         except Exception as e:
             logger.error("Cache get error", key=key, error=str(e))
             return None
+
+    def _decode(self, key: str, data: Optional[bytes]) -> Optional[Any]:
+        if not data:
+            return None
+        try:
+            return self.codec.decode(data)
+        except CodecError:
+            # Written by an older/other format (e.g. legacy pickle): treat as a miss
+            logger.debug("Cache undecodable value", key=key)
+            return None
+        except Exception as e:
+            # Known tag but a corrupt or truncated body: also a miss, never a 500
+            logger.warning("Cache corrupt value", key=key, error=str(e))
+            return None
     
     async def set(
         self, 
         key: str, 
         value: Any, 
-        expire: Optional[Union[int, timedelta]] = None
+        expire: Optional[Union[int, timedelta]] = None,
+        tags: Optional[Iterable[str]] = None,
     ) -> bool:
-        """Set value in cache."""
+        """Set value in cache, optionally registering it under invalidation tags."""
         if not self._redis:
             return False
         
         try:
-            data = pickle.dumps(value)
+            data = self.codec.encode(value)
+        except Exception as e:
+            logger.error("Cache set error", key=key, error=str(e))
+            return False
+        return await self._set_raw(key, data, expire, tags)
+
+    async def _set_raw(
+        self,
+        key: str,
+        data: bytes,
+        expire: Optional[Union[int, timedelta]] = None,
+        tags: Optional[Iterable[str]] = None,
+    ) -> bool:
+        try:
             if isinstance(expire, timedelta):
                 expire = int(expire.total_seconds())
             
-            await self._redis.set(key, data, ex=expire)
+            if not tags:
+                await self._redis.set(key, data, ex=expire)
+                return True
+
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.set(key, data, ex=expire)
+            for tag in tags:
+                pipe.sadd(tag_set_key(tag), key)
+                if expire:
+                    # Members of a tag share a TTL, so the newest add outlives the rest
+                    pipe.expire(tag_set_key(tag), expire)
+            await pipe.execute()
             return True
         except Exception as e:
             logger.error("Cache set error", key=key, error=str(e))
@@ -91,55 +168,629 @@ class RedisCache:
         except Exception as e:
             logger.error("Cache exists error", key=key, error=str(e))
             return False
-    
+
+    async def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        """
+        Try to take the short-lived lock for ``key`` (SET NX PX). Returns the
+        owner token, or None if another worker holds it or Redis is down.
+        """
+        if not self._redis:
+            return None
+
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self._redis.set(lock_key(key), token, nx=True, px=int(ttl * 1000))
+            return token if acquired else None
+        except Exception as e:
+            logger.error("Cache lock error", key=key, error=str(e))
+            return None
+
+    async def release_lock(self, key: str, token: str) -> bool:
+        """Release the lock only if ``token`` still owns it."""
+        if not self._redis:
+            return False
+
+        try:
+            return bool(await self._redis.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key(key), token))
+        except Exception as e:
+            logger.error("Cache unlock error", key=key, error=str(e))
+            return False
+
+    async def _unlink(self, keys: List[bytes]) -> int:
+        """UNLINK in small pipelined chunks; memory is reclaimed off-thread."""
+        pipe = self._redis.pipeline(transaction=False)
+        for i in range(0, len(keys), settings.CACHE_UNLINK_CHUNK):
+            pipe.unlink(*keys[i:i + settings.CACHE_UNLINK_CHUNK])
+        return sum(await pipe.execute())
+
     async def clear_pattern(self, pattern: str) -> int:
-        """Clear keys matching pattern."""
+        """
+        Clear keys matching pattern. Walks the keyspace with SCAN and
+        unlinks each page as it arrives, so Redis is never blocked by KEYS.
+        """
         if not self._redis:
             return 0
         
         try:
-            keys = await self._redis.keys(pattern)
-            if keys:
-                return await self._redis.delete(*keys)
-            return 0
+            removed = 0
+            page: List[bytes] = []
+            async for key in self._redis.scan_iter(match=pattern, count=settings.CACHE_SCAN_COUNT):
+                page.append(key)
+                if len(page) >= settings.CACHE_SCAN_COUNT:
+                    removed += await self._unlink(page)
+                    page = []
+            if page:
+                removed += await self._unlink(page)
+            return removed
         except Exception as e:
             logger.error("Cache clear pattern error", pattern=pattern, error=str(e))
             return 0
 
+    async def invalidate_tag(self, tag: str) -> int:
+        """Unlink every key registered under a tag via set(..., tags=[tag])."""
+        if not self._redis:
+            return 0
+
+        # Atomically detach the member set so concurrent sets start a fresh one
+        purge_key = f"{tag_set_key(tag)}:purge:{uuid.uuid4().hex}"
+        try:
+            await self._redis.rename(tag_set_key(tag), purge_key)
+        except aioredis.ResponseError:
+            return 0  # no such tag
+
+        try:
+            removed = 0
+            cursor = 0
+            while True:
+                cursor, members = await self._redis.sscan(
+                    purge_key, cursor, count=settings.CACHE_SCAN_COUNT
+                )
+                if members:
+                    removed += await self._unlink(list(members))
+                if cursor == 0:
+                    break
+            await self._redis.unlink(purge_key)
+            return removed
+        except Exception as e:
+            logger.error("Cache invalidate tag error", tag=tag, error=str(e))
+            return 0
+
+class LRUCache:
+    """Bounded in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, expire: Optional[Union[int, timedelta]] = None):
+        if isinstance(expire, timedelta):
+            expire = expire.total_seconds()
+        expires_at = time.monotonic() + expire if expire else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> bool:
+        return self._data.pop(key, None) is not None
+
+    def delete_prefix(self, prefix: str) -> int:
+        keys = [k for k in self._data if k.startswith(prefix)]
+        for k in keys:
+            del self._data[k]
+        return len(keys)
+
+class SingleFlight:
+    """
+    In-process request coalescing: concurrent ``do(key, fn)`` calls share
+    the result (or exception) of the one ``fn()`` that is already running.
+    The shared call runs in its own task, so cancelling any caller (the
+    one that started it included) leaves it running for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(partial(self._done, key))
+        # shield: a cancelled caller must not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here, so no "never retrieved" warning when every caller left
+
+class L1Cache:
+    """
+    In-process tier of encoded payloads, bounded by entry count and total
+    bytes. Holding bytes (not objects) makes the size bound exact and
+    keeps callers from mutating each other's values.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 32 * 1024 * 1024, ttl_seconds: float = 30.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, data = item
+        if time.monotonic() >= expires_at:
+            self.delete(key)
+            return None
+        self._data.move_to_end(key)
+        return data
+
+    def set(self, key: str, data: bytes, expire: Optional[float] = None):
+        self.delete(key)
+        if len(data) > self.max_bytes:
+            return
+        ttl = min(self.ttl_seconds, expire) if expire else self.ttl_seconds
+        self._data[key] = (time.monotonic() + ttl, data)
+        self.size_bytes += len(data)
+        while len(self._data) > self.max_entries or self.size_bytes > self.max_bytes:
+            self.delete(next(iter(self._data)))
+
+    def delete(self, key: str) -> bool:
+        item = self._data.pop(key, None)
+        if item is None:
+            return False
+        self.size_bytes -= len(item[1])
+        return True
+
+    def clear(self):
+        self._data.clear()
+        self.size_bytes = 0
+
+
+class TieredCache(RedisCache):
+    """
+    RedisCache with an in-process L1 in front. Reads try L1 before Redis;
+    writes and deletes go to both tiers and are published on a pub/sub
+    channel so other workers drop their L1 copies. Messages missed while
+    the subscriber reconnects are bounded by the L1 TTL, and L1 is cleared
+    whenever the channel is lost.
+    """
+
+    def __init__(
+        self,
+        redis_url: str = "redis://localhost:6379",
+        codec: Optional[TaggedCodec] = None,
+        l1: Optional[L1Cache] = None,
+        channel: str = "cache:invalidate",
+    ):
+        super().__init__(redis_url, codec)
+        self.l1 = l1 if l1 is not None else L1Cache()
+        self.channel = channel
+        self._origin = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+
+        self.l1_hits = 0
+        self.l1_misses = 0
+        self.l2_hits = 0
+        self.l2_misses = 0
+
+    async def connect(self):
+        await super().connect()
+        if self._redis and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def disconnect(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self.l1.clear()
+        await super().disconnect()
+
+    def _record(self):
+        update_cache_metrics("l1", self.l1_hits, self.l1_hits + self.l1_misses)
+        update_cache_metrics("l2", self.l2_hits, self.l2_hits + self.l2_misses)
+
+    def tier_stats(self) -> Dict[str, int]:
+        return {
+            "l1_hits": self.l1_hits,
+            "l1_misses": self.l1_misses,
+            "l2_hits": self.l2_hits,
+            "l2_misses": self.l2_misses,
+            "l1_entries": len(self.l1),
+            "l1_bytes": self.l1.size_bytes,
+        }
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Get value from L1, falling back to Redis and filling L1."""
+        if not self._redis:
+            return None
+
+        data = self.l1.get(key)
+        if data is not None:
+            self.l1_hits += 1
+            self._record()
+            return self._decode(key, data)
+        self.l1_misses += 1
+
+        try:
+            # Same round-trip as a plain GET; PTTL keeps L1 from outliving Redis
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.pttl(key)
+            data, pttl = await pipe.execute()
+        except Exception as e:
+            logger.error("Cache get error", key=key, error=str(e))
+            return None
+
+        if data:
+            self.l2_hits += 1
+            self.l1.set(key, data, pttl / 1000 if pttl > 0 else None)
+        else:
+            self.l2_misses += 1
+        self._record()
+        return self._decode(key, data)
+
+    async def _set_raw(
+        self,
+        key: str,
+        data: bytes,
+        expire: Optional[Union[int, timedelta]] = None,
+        tags: Optional[Iterable[str]] = None,
+    ) -> bool:
+        stored = await super()._set_raw(key, data, expire, tags)
+        if stored:
+            self.l1.set(key, data, _seconds(expire) if expire else None)
+            await self._publish([key])
+        return stored
+
+    async def delete(self, key: str) -> bool:
+        self.l1.delete(key)
+        deleted = await super().delete(key)
+        if deleted:
+            await self._publish([key])
+        return deleted
+
+    async def exists(self, key: str) -> bool:
+        if self._redis and self.l1.get(key) is not None:
+            return True
+        return await super().exists(key)
+
+    async def _unlink(self, keys: List[bytes]) -> int:
+        # clear_pattern and invalidate_tag both end here with concrete keys
+        names = [k.decode() if isinstance(k, bytes) else k for k in keys]
+        for name in names:
+            self.l1.delete(name)
+        removed = await super()._unlink(keys)
+        await self._publish(names)
+        return removed
+
+    async def _publish(self, keys: List[str]):
+        try:
+            message = json.dumps({"origin": self._origin, "keys": keys})
+            await self._redis.publish(self.channel, message)
+        except Exception as e:
+            logger.error("Cache invalidation publish error", error=str(e))
+
+    def _apply(self, data: bytes):
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return
+        if message.get("origin") == self._origin:
+            return
+        for key in message.get("keys", ()):
+            self.l1.delete(key)
+
+    async def _listen(self):
+        while self._redis is not None:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                try:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        self._apply(message["data"])
+                finally:
+                    await pubsub.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Cache invalidation channel lost", error=str(e))
+            # Invalidations may have been missed: don't serve what L1 holds
+            self.l1.clear()
+            await asyncio.sleep(1.0)
+
 # Global cache instance
-cache = RedisCache()
+if settings.CACHE_L1_ENABLED:
+    cache = TieredCache(
+        settings.REDIS_URL,
+        get_codec(settings.CACHE_CODEC),
+        L1Cache(
+            max_entries=settings.CACHE_L1_MAX_ENTRIES,
+            max_bytes=settings.CACHE_L1_MAX_BYTES,
+            ttl_seconds=settings.CACHE_L1_TTL_SECONDS,
+        ),
+        channel=settings.CACHE_INVALIDATION_CHANNEL,
+    )
+else:
+    cache = RedisCache(settings.REDIS_URL, get_codec(settings.CACHE_CODEC))
+
+# =====================================================
+# CACHE KEY DERIVATION
+# =====================================================
+# Request-scoped arguments that say nothing about the result
+_KEY_SKIP_TYPES = (AsyncSession, Session, Request, BackgroundTasks)
+
+
+class UnkeyableArgument(TypeError):
+    """An argument has no stable representation; pass ``key_builder``."""
+
+
+def _key_part(value: Any) -> Any:
+    """Canonical, process-independent JSON form of one argument."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Enum):
+        return _key_part(value.value)
+    if isinstance(value, (datetime, date, time_of_day)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, np.ndarray):
+        data = np.ascontiguousarray(value)
+        return [data.dtype.str, list(data.shape), hashlib.blake2b(data.tobytes(), digest_size=16).hexdigest()]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, BaseModel):
+        return _key_part(value.model_dump(mode="json"))
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return _key_part(dataclasses.asdict(value))
+    if isinstance(value, dict):
+        return [[_key_part(k), _key_part(v)] for k, v in sorted(value.items(), key=lambda kv: repr(kv[0]))]
+    if isinstance(value, (list, tuple)):
+        return [_key_part(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_key_part(v) for v in value), key=_dumps)
+    raise UnkeyableArgument(f"Cannot derive a stable cache key from {type(value).__name__}")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def build_cache_key(key_prefix: str, func: Callable, args: tuple, kwargs: dict) -> str:
+    """
+    Deterministic key for ``func(*args, **kwargs)``: identical across
+    processes and restarts. Arguments are bound to the signature (so
+    ``f(1)`` and ``f(x=1)`` agree, defaults included), sessions and
+    requests are skipped, and the canonical form is digested with blake2b.
+    """
+    bound = _signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    parts = [
+        [name, _key_part(value)]
+        for name, value in bound.arguments.items()
+        if not isinstance(value, _KEY_SKIP_TYPES)
+    ]
+    payload = _dumps([func.__module__, func.__qualname__, parts])
+    return f"{key_prefix}:{hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()}"
+
+
+@lru_cache(maxsize=None)
+def _signature(func: Callable) -> inspect.Signature:
+    return inspect.signature(func)
+
+# =====================================================
+# STAMPEDE PROTECTION
+# =====================================================
+LOCK_POLL_INTERVAL = 0.05
+
+_flights = SingleFlight()
+_refreshing: Dict[str, asyncio.Task] = {}
+
+
+def _seconds(value: Union[int, float, timedelta]) -> float:
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+def _is_envelope(value: Any) -> bool:
+    return isinstance(value, dict) and value.keys() == {"v", "t", "d"}
+
+
+def _should_refresh_early(fresh_until: float, delta: float, beta: float) -> bool:
+    """
+    XFetch: refresh with probability rising towards expiry, scaled by how
+    long the value took to compute (delta) and by ``beta``.
+    """
+    if beta <= 0:
+        return False
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= fresh_until
+
+
+def _request_scoped(args: tuple, kwargs: dict) -> bool:
+    """Whether a call passes a resource that only lives as long as its request."""
+    return any(isinstance(v, _KEY_SKIP_TYPES) for v in (*args, *kwargs.values()))
+
+
+async def compute_once(
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+    read: Callable[[], Awaitable[Any]],
+    lock_timeout: float,
+) -> Any:
+    """
+    Cross-worker single-flight: ``compute()`` (which stores its result) runs
+    under the Redis lock for ``key``. A worker that finds the lock taken
+    polls ``read()`` for the owner's value, and takes over as soon as the
+    lock is released without one rather than waiting out ``lock_timeout``.
+    """
+    if not cache.available:
+        return await compute()
+
+    deadline = time.monotonic() + lock_timeout
+    while True:
+        token = await cache.acquire_lock(key, lock_timeout)
+        if token is not None:
+            try:
+                return await compute()
+            finally:
+                await cache.release_lock(key, token)
+
+        # Another worker is computing: wait for its value, not our own
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            value = await read()
+            if value is not None:
+                return value
+            if not await cache.exists(lock_key(key)):
+                break  # the owner failed or gave up; try to take the lock
+        else:
+            logger.warning("Cache lock wait timed out", key=key)
+            return await compute()
+
+
+def _refresh_done(key: str, task: asyncio.Task):
+    _refreshing.pop(key, None)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Background cache refresh failed", error=str(task.exception()))
+
 
 def cached(
     key_prefix: str,
     expire: Union[int, timedelta] = timedelta(minutes=5),
-    key_builder: Optional[callable] = None
+    key_builder: Optional[callable] = None,
+    stale_ttl: Union[int, timedelta] = timedelta(0),
+    early_refresh_beta: float = 0.0,
+    lock_timeout: float = 10.0,
 ):
-    """Decorator for caching function results."""
+    """
+    Decorator for caching function results.
+
+    Concurrent misses for a key run the function once: callers in this
+    process share one call, and other workers wait on a Redis lock for
+    its result. Values are stored with their fresh-until time and compute
+    duration; with ``early_refresh_beta > 0`` they may be refreshed early
+    in the background (XFetch), and they stay servable for ``stale_ttl``
+    past ``expire`` while a single caller recomputes them.
+
+    Keys come from ``build_cache_key`` unless ``key_builder`` is given.
+    Results go through the cache codec, so they must be the value types it
+    supports (see CACHE_CODEC): a tuple comes back as a list, and under
+    orjson/json a datetime comes back as an ISO string.
+
+    Background refreshes reuse the original arguments, so a call that
+    passes a request-scoped resource (session, request, background tasks)
+    never refreshes in the background: a stale value is recomputed in the
+    foreground instead, and early refresh is skipped.
+    """
+    fresh_seconds = _seconds(expire)
+    stale_seconds = _seconds(stale_ttl)
+    redis_ttl = math.ceil(fresh_seconds + stale_seconds)
+
     def decorator(func):
+        async def compute(cache_key: str, args, kwargs) -> Any:
+            started = time.monotonic()
+            result = await func(*args, **kwargs)
+            envelope = {
+                "v": result,
+                "t": time.time() + fresh_seconds,
+                "d": time.monotonic() - started,
+            }
+            await cache.set(cache_key, envelope, redis_ttl)
+            logger.debug("Cache set", key=cache_key)
+            return result
+
+        async def load(cache_key: str, args, kwargs) -> Any:
+            async def fresh() -> Any:
+                envelope = await cache.get(cache_key)
+                if _is_envelope(envelope) and time.time() < envelope["t"]:
+                    return envelope["v"]
+                return None
+
+            return await compute_once(
+                cache_key, lambda: compute(cache_key, args, kwargs), fresh, lock_timeout
+            )
+
+        def refresh_in_background(cache_key: str, args, kwargs):
+            if cache_key in _refreshing or _flights.in_flight(cache_key):
+                return
+            task = asyncio.create_task(
+                _flights.do(cache_key, lambda: load(cache_key, args, kwargs))
+            )
+            _refreshing[cache_key] = task
+            task.add_done_callback(partial(_refresh_done, cache_key))
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # Build cache key
-            if key_builder:
-                cache_key = key_builder(*args, **kwargs)
-            else:
-                cache_key = f"{key_prefix}:{hash(str(args) + str(kwargs))}"
-            
+            try:
+                if key_builder:
+                    cache_key = key_builder(*args, **kwargs)
+                else:
+                    cache_key = build_cache_key(key_prefix, func, args, kwargs)
+            except UnkeyableArgument as e:
+                logger.warning("Cache bypassed", function=func.__qualname__, error=str(e))
+                return await func(*args, **kwargs)
+
             # Try to get from cache
-            cached_result = await cache.get(cache_key)
-            if cached_result is not None:
-                logger.debug("Cache hit", key=cache_key)
-                return cached_result
-            
-            # Execute function and cache result
-            result = await func(*args, **kwargs)
-            await cache.set(cache_key, result, expire)
-            logger.debug("Cache set", key=cache_key)
-            
-            return result
+            envelope = await cache.get(cache_key)
+            if _is_envelope(envelope):
+                stale = time.time() >= envelope["t"]
+                # The request's session or request object is gone once it returns
+                detachable = not _request_scoped(args, kwargs)
+                if stale and not detachable:
+                    logger.debug("Cache stale, recomputing in request", key=cache_key)
+                    return await _flights.do(cache_key, lambda: load(cache_key, args, kwargs))
+                if detachable and (stale or _should_refresh_early(envelope["t"], envelope["d"], early_refresh_beta)):
+                    refresh_in_background(cache_key, args, kwargs)
+                logger.debug("Cache hit", key=cache_key, stale=stale)
+                return envelope["v"]
+
+            # Miss: one computation per key, however many callers are waiting
+            return await _flights.do(cache_key, lambda: load(cache_key, args, kwargs))
         return wrapper
     return decorator
 
 # Cache key builders
+def tag_set_key(tag: str) -> str:
+    """Redis set holding the keys registered under an invalidation tag."""
+    return f"tag:{tag}"
+
+def lock_key(key: str) -> str:
+    """Single-flight lock guarding the recompute of ``key``."""
+    return f"lock:{key}"
+
 def device_cache_key(device_id: str, suffix: str = "") -> str:
     """Build cache key for device-specific data."""
     return f"device:{device_id}{suffix}"
@@ -0,0 +1,208 @@
+import json
+import pickle
+import struct
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class CodecError(ValueError):
+    """Raised for payloads no registered codec can decode."""
+
+
+def _to_builtin(obj: Any) -> Any:
+    # Shared fallback for the stdlib JSON and msgpack encoders
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+# msgpack extension types: datetimes and dates survive the round trip
+_EXT_DATETIME = 1
+_EXT_DATE = 2
+
+
+def _msgpack_default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode())
+    if isinstance(obj, date):
+        return msgpack.ExtType(_EXT_DATE, obj.isoformat().encode())
+    return _to_builtin(obj)
+
+
+def _msgpack_ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    if code == _EXT_DATE:
+        return date.fromisoformat(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+# =====================================================
+# CODECS
+# =====================================================
+class Codec:
+    """Turns cache values into bytes and back. ``tag`` prefixes every payload."""
+
+    name = ""
+    tag = b""
+
+    def encode(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    """Datetimes and dates decode as ISO strings, tuples as lists."""
+
+    name = "json"
+    tag = b"J"
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":"), default=_to_builtin).encode()
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """Fastest; same type changes as JsonCodec and ~30% larger than pickle."""
+
+    name = "orjson"
+    tag = b"O"
+
+    def encode(self, value: Any) -> bytes:
+        return orjson.dumps(
+            value,
+            default=_to_builtin,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+
+    def decode(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """Smallest encoding. Datetimes and dates round-trip; tuples decode as lists."""
+
+    name = "msgpack"
+    tag = b"M"
+
+    def encode(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True, default=_msgpack_default)
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, ext_hook=_msgpack_ext_hook)
+
+
+class NumpyCodec(Codec):
+    """
+    Raw ndarray buffer: ``<dtype len><dtype str><ndim><shape...><bytes>``.
+    Decoded arrays are read-only views over the cached bytes.
+    """
+
+    name = "numpy"
+    tag = b"N"
+
+    def encode(self, value: np.ndarray) -> bytes:
+        arr = np.ascontiguousarray(value)
+        dtype = arr.dtype.str.encode()
+        header = struct.pack(
+            f"<B{len(dtype)}sB{arr.ndim}Q",
+            len(dtype), dtype, arr.ndim, *arr.shape,
+        )
+        return header + arr.tobytes()
+
+    def decode(self, data: bytes) -> np.ndarray:
+        dlen = data[0]
+        dtype = np.dtype(data[1:1 + dlen].decode())
+        ndim = data[1 + dlen]
+        offset = 2 + dlen
+        shape = struct.unpack_from(f"<{ndim}Q", data, offset)
+        offset += 8 * ndim
+        return np.frombuffer(data, dtype=dtype, offset=offset).reshape(shape)
+
+
+class PickleCodec(Codec):
+    """Legacy format. Only for caches no untrusted writer can reach."""
+
+    name = "pickle"
+    tag = b"P"
+
+    def encode(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+# =====================================================
+# TAGGED DISPATCH
+# =====================================================
+class TaggedCodec:
+    """
+    Encodes ndarrays with NumpyCodec and everything else with ``default``,
+    prefixing the codec tag so readers can decode any known format.
+    Pickle payloads are only decoded when pickle is the configured default.
+    """
+
+    def __init__(self, default: Codec, array_codec: Optional[Codec] = None):
+        self.default = default
+        self.array_codec = array_codec or NumpyCodec()
+        decoders = [JsonCodec(), self.array_codec, default]
+        if orjson is not None:
+            decoders.append(OrjsonCodec())
+        if msgpack is not None:
+            decoders.append(MsgpackCodec())
+        self._by_tag: Dict[bytes, Codec] = {c.tag: c for c in decoders}
+
+    def encode(self, value: Any) -> bytes:
+        codec = self.array_codec if isinstance(value, np.ndarray) else self.default
+        return codec.tag + codec.encode(value)
+
+    def decode(self, data: bytes) -> Any:
+        codec = self._by_tag.get(data[:1])
+        if codec is None:
+            raise CodecError(f"Unknown cache payload tag {data[:1]!r}")
+        return codec.decode(data[1:])
+
+
+def get_codec(name: str = "auto") -> TaggedCodec:
+    """
+    Build the cache codec: auto | msgpack | orjson | json | pickle. auto
+    prefers msgpack, the only one smaller than pickle, then orjson.
+    """
+    if name == "auto":
+        name = "msgpack" if msgpack is not None else "orjson" if orjson is not None else "json"
+
+    codecs = {
+        "orjson": OrjsonCodec,
+        "msgpack": MsgpackCodec,
+        "json": JsonCodec,
+        "pickle": PickleCodec,
+    }
+    if name not in codecs:
+        raise ValueError(f"Unknown cache codec '{name}'")
+    if name == "orjson" and orjson is None:
+        raise ValueError("CACHE_CODEC=orjson but orjson is not installed")
+    if name == "msgpack" and msgpack is None:
+        raise ValueError("CACHE_CODEC=msgpack but msgpack is not installed")
+
+    return TaggedCodec(codecs[name]())
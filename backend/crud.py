@@ -1,9 +1,18 @@
-from typing import Optional, List
-from sqlalchemy import select, desc
+import base64
+import json
+from typing import AsyncIterator, Optional, List, Dict, Sequence, Tuple, Union
+from sqlalchemy import select, desc, insert, event, func, and_, or_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime, timezone
+from sqlalchemy.orm import Session
+from datetime import datetime, timezone, timedelta
 
+from app_config import settings
+from cache import LRUCache
 from db_models import Device, SensorReading, Forecast8h, User
+from schemas import IngestPayload
+
+Coords = Tuple[Optional[float], Optional[float]]
 
 
 # =====================================================
@@ -41,6 +50,174 @@ async def upsert_device(
     return device
 
 
+# =====================================================
+# DEVICE PK CACHE
+# =====================================================
+# device_id -> (Device.id, lat, lon). Entries expire after the last_seen
+# refresh interval, so a steady stream re-upserts a device at most once
+# per interval. Filled only after commit so a rolled-back insert never
+# leaves a dangling pk behind.
+_device_pks = LRUCache(settings.DEVICE_CACHE_MAX_ENTRIES)
+
+_UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_device_pks(session: Session):
+    pending = session.info.pop("pending_device_pks", None)
+    for device_id, entry in (pending or {}).items():
+        _device_pks.set(device_id, entry, settings.DEVICE_LAST_SEEN_REFRESH_SECONDS)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_device_pks(session: Session):
+    session.info.pop("pending_device_pks", None)
+
+
+def _cached_pk(device_id: str, lat: Optional[float], lon: Optional[float]) -> Optional[int]:
+    """Cached Device.id, unless the device is due for an upsert."""
+    entry = _device_pks.get(device_id)
+    if entry is None:
+        return None
+    pk, cached_lat, cached_lon = entry
+    if (lat is not None and lat != cached_lat) or (lon is not None and lon != cached_lon):
+        return None
+    return pk
+
+
+def _remember(session: AsyncSession, device_id: str, pk: int, lat: Optional[float], lon: Optional[float]):
+    session.sync_session.info.setdefault("pending_device_pks", {})[device_id] = (pk, lat, lon)
+
+
+async def upsert_devices(
+    session: AsyncSession,
+    coords: Dict[str, Coords],
+) -> Dict[str, int]:
+    """
+    Resolve device_id -> Device.id, creating devices and refreshing
+    last_seen/lat/lon as needed. Devices cached in this process cost
+    nothing; the rest share one INSERT ... ON CONFLICT DO UPDATE ...
+    RETURNING statement (PostgreSQL, SQLite >= 3.35).
+    """
+    pks: Dict[str, int] = {}
+    stale: Dict[str, Coords] = {}
+    for device_id, (lat, lon) in coords.items():
+        pk = _cached_pk(device_id, lat, lon)
+        if pk is None:
+            stale[device_id] = (lat, lon)
+        else:
+            pks[device_id] = pk
+
+    if not stale:
+        return pks
+
+    dialect_insert = _UPSERT_DIALECTS.get(session.bind.dialect.name)
+    if dialect_insert is None:
+        # No native upsert: SELECT + flush per device
+        for device_id, (lat, lon) in stale.items():
+            device = await upsert_device(session, device_id, lat, lon)
+            pks[device_id] = device.id
+            _remember(session, device_id, device.id, device.lat, device.lon)
+        return pks
+
+    now = datetime.now(timezone.utc)
+    stmt = dialect_insert(Device).values([
+        {"device_id": device_id, "lat": lat, "lon": lon, "last_seen": now}
+        for device_id, (lat, lon) in stale.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Device.device_id],
+        set_={
+            "last_seen": stmt.excluded.last_seen,
+            # a payload without coordinates keeps the stored ones
+            "lat": func.coalesce(stmt.excluded.lat, Device.lat),
+            "lon": func.coalesce(stmt.excluded.lon, Device.lon),
+        },
+    ).returning(Device.device_id, Device.id, Device.lat, Device.lon)
+
+    res = await session.execute(stmt)
+    for device_id, pk, lat, lon in res.all():
+        pks[device_id] = pk
+        _remember(session, device_id, pk, lat, lon)
+    return pks
+
+
+async def upsert_device_id(
+    session: AsyncSession,
+    device_id: str,
+    lat: Optional[float],
+    lon: Optional[float],
+) -> int:
+    """Single-device upsert_devices: returns Device.id."""
+    pks = await upsert_devices(session, {device_id: (lat, lon)})
+    return pks[device_id]
+
+
+async def device_pks(session: AsyncSession, device_ids: Sequence[str]) -> Dict[str, int]:
+    """Device.id for existing devices (cache first, one SELECT for the rest)."""
+    pks: Dict[str, int] = {}
+    missing = []
+    for device_id in device_ids:
+        entry = _device_pks.get(device_id)
+        if entry is None:
+            missing.append(device_id)
+        else:
+            pks[device_id] = entry[0]
+
+    if missing:
+        res = await session.execute(
+            select(Device.device_id, Device.id).where(Device.device_id.in_(missing))
+        )
+        pks.update(res.tuples().all())
+    return pks
+
+
+# =====================================================
+# BULK INGEST
+# =====================================================
+async def bulk_insert_readings(
+    session: AsyncSession,
+    payloads: Sequence[IngestPayload],
+) -> List[str]:
+    """
+    Upserts the distinct devices in one statement, then writes all
+    readings with a single executemany INSERT. Returns the distinct device ids touched.
+    """
+    coords: Dict[str, Coords] = {}
+    for p in payloads:
+        lat, lon = coords.get(p.device_id, (None, None))
+        coords[p.device_id] = (
+            p.lat if p.lat is not None else lat,
+            p.lon if p.lon is not None else lon,
+        )
+
+    pks = await upsert_devices(session, coords)
+
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "device_id": pks[p.device_id],
+            "device_key": p.device_id,
+            "ts": p.ts or now,
+            "temperature": p.temperature,
+            "humidity": p.humidity,
+            "wind_speed": p.wind_speed,
+            "radiation": p.radiation,
+            "precipitation": p.precipitation,
+            "raw": p.model_dump(mode="json"),
+        }
+        for p in payloads
+    ]
+
+    # ORM bulk insert → batched multi-row VALUES ("insertmanyvalues")
+    await session.execute(insert(SensorReading), rows)
+
+    return list(coords)
+
+
 # =====================================================
 # LATEST SENSOR READING
 # =====================================================
@@ -74,6 +251,72 @@ async def get_latest_reading(
     }
 
 
+# =====================================================
+# READINGS HISTORY (keyset pagination)
+# =====================================================
+# Readings are paged in (ts, id) order: ts walks idx_devicekey_ts and id
+# breaks ties between readings with the same timestamp.
+Cursor = Tuple[datetime, int]
+
+READING_COLUMNS = ["ts", "temperature", "humidity", "wind_speed", "radiation", "precipitation"]
+
+
+def encode_cursor(ts: datetime, reading_id: int) -> str:
+    raw = json.dumps([ts.isoformat(), reading_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Inverse of encode_cursor; raises ValueError for anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, reading_id = json.loads(raw)
+        return datetime.fromisoformat(ts), int(reading_id)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+
+
+async def iter_reading_batches(
+    session: AsyncSession,
+    device_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[Cursor] = None,
+    limit: int = 10_000,
+    fetch_rows: int = 1_000,
+) -> AsyncIterator[List[Sequence]]:
+    """
+    Stream up to ``limit`` readings of a device in [start, end), in (ts, id)
+    order and strictly after the ``after`` cursor. Rows are
+    (id, ts, temperature, humidity, wind_speed, radiation, precipitation)
+    and arrive in batches of up to ``fetch_rows`` from a server-side cursor.
+    """
+    conditions = [SensorReading.device_key == device_id]
+    if start is not None:
+        conditions.append(SensorReading.ts >= start)
+    if end is not None:
+        conditions.append(SensorReading.ts < end)
+    if after is not None:
+        after_ts, after_id = after
+        # ts >= bound keeps the index range; the OR resolves ties on ts
+        conditions.append(SensorReading.ts >= after_ts)
+        conditions.append(or_(
+            SensorReading.ts > after_ts,
+            and_(SensorReading.ts == after_ts, SensorReading.id > after_id),
+        ))
+
+    q = (
+        select(SensorReading.id, *(getattr(SensorReading, c) for c in READING_COLUMNS))
+        .where(*conditions)
+        .order_by(SensorReading.ts, SensorReading.id)
+        .limit(limit)
+        .execution_options(yield_per=fetch_rows)
+    )
+    result = await session.stream(q)
+    async for batch in result.partitions():
+        yield batch
+
+
 # =====================================================
 # DEVICE LIST
 # =====================================================
@@ -94,9 +337,22 @@ async def last_n_readings(
     """
     Returns latest N readings in chronological order (old → new)
     """
+    rows, _ = await last_n_readings_with_ts(session, device_id, n)
+    return rows
+
+
+async def last_n_readings_with_ts(
+    session: AsyncSession,
+    device_id: str,
+    n: int = 24,
+) -> Tuple[List[List[float]], Optional[datetime]]:
+    """
+    Same as last_n_readings, plus the timestamp of the newest row
+    """
 
     q = (
         select(
+            SensorReading.ts,
             SensorReading.temperature,
             SensorReading.humidity,
             SensorReading.wind_speed,
@@ -112,12 +368,14 @@ async def last_n_readings(
     rows = res.all()
 
     if not rows:
-        return []
+        return [], None
+
+    newest_ts = rows[0][0]
 
     # reverse → chronological order
     rows = list(reversed(rows))
 
-    return [list(map(float, r)) for r in rows]
+    return [list(map(float, r[1:])) for r in rows], newest_ts
 
 
 # =====================================================
@@ -125,13 +383,13 @@ async def last_n_readings(
 # =====================================================
 async def store_forecast(
     session: AsyncSession,
-    device: Device,
+    device: Union[Device, int],
     for_ts: List[str],
     predictions: dict,
     model_version: str,
 ):
     forecast = Forecast8h(
-        device_id=device.id,
+        device_id=device if isinstance(device, int) else device.id,
         for_ts=for_ts,
         predictions=predictions,
         model_version=model_version,
@@ -140,6 +398,44 @@ async def store_forecast(
     session.add(forecast)
 
 
+# =====================================================
+# LATEST STORED FORECAST
+# =====================================================
+async def latest_forecast(
+    session: AsyncSession,
+    device_id: str,
+    max_age: timedelta,
+) -> Optional[dict]:
+    """
+    Newest model forecast for a device if it is younger than max_age
+    (served by idx_forecast_device_predts)
+    """
+    cutoff = datetime.now(timezone.utc) - max_age
+
+    q = (
+        select(Forecast8h)
+        .join(Device, Forecast8h.device_id == Device.id)
+        .where(Device.device_id == device_id)
+        .where(Forecast8h.pred_ts >= cutoff)
+        .where(Forecast8h.model_version != "fallback")
+        .order_by(desc(Forecast8h.pred_ts))
+        .limit(1)
+    )
+
+    res = await session.execute(q)
+    fc = res.scalar_one_or_none()
+    if fc is None:
+        return None
+
+    return {
+        "device_id": device_id,
+        "pred_ts": fc.pred_ts,
+        "for_ts": fc.for_ts,
+        "predictions": fc.predictions,
+        "model_version": fc.model_version,
+    }
+
+
 # =========================================================
 # USER CRUD OPERATIONS
 # =========================================================
@@ -1,38 +1,123 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 from sqlalchemy import text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app_config import settings
 from db_models import Base
+from metrics import track_database_pool, observe_database_pool_wait
 from fastapi import Depends
+import asyncio
 import os
+import time
+import uuid
+from typing import Optional
 from urllib.parse import urlparse, parse_qs
+import structlog
+
+logger = structlog.get_logger()
+
+
+def _normalize_url(url: str):
+    """Return (url, sslmode, pgbouncer) with the query params asyncpg rejects stripped."""
+    # Convert postgresql:// to postgresql+asyncpg:// for async support
+    if url.startswith("postgresql://"):
+        url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+    # Extract sslmode / pgbouncer from URL and remove them (asyncpg uses connect_args)
+    parsed = urlparse(url)
+    sslmode = "require"
+    pgbouncer = None
+    if parsed.query:
+        params = parse_qs(parsed.query)
+        if "sslmode" in params:
+            sslmode = params["sslmode"][0]
+        if "pgbouncer" in params:
+            pgbouncer = params["pgbouncer"][0].lower() in ("1", "true", "yes")
+        # Remove both from query
+        clean_query = "&".join(k + "=" + v[0] for k, v in params.items() if k not in ("sslmode", "pgbouncer"))
+        url = parsed._replace(query=clean_query).geturl()
+
+    # DB_PGBOUNCER wins, then ?pgbouncer=. A pooler cannot be detected reliably
+    # from the URL, so without either the statement cache stays off.
+    if settings.DB_PGBOUNCER is not None:
+        pgbouncer = settings.DB_PGBOUNCER
+    elif pgbouncer is None:
+        pgbouncer = True
+    return url, sslmode, pgbouncer
+
+
+def _connect_args(url: str, sslmode: str, pgbouncer: bool) -> dict:
+    if not url.startswith("postgresql+asyncpg"):
+        return {}
+    if pgbouncer:
+        # Transaction pooling hands each transaction a different server
+        # connection, so no statement may outlive it
+        return {
+            "ssl": sslmode,
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return {
+        "ssl": sslmode,
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that reports how long each checkout waited for a connection."""
+
+    # Metrics label; a class attribute so it survives engine.dispose() recreating the pool
+    label = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            observe_database_pool_wait(time.perf_counter() - started, self.label)
+
+
+class ReplicaPool(InstrumentedPool):
+    label = "replica"
+
+
+def _pool_args(url: str, poolclass: type) -> dict:
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+
+
+def _make_engine(raw_url: str, poolclass: type = InstrumentedPool) -> AsyncEngine:
+    url, sslmode, pgbouncer = _normalize_url(raw_url)
+    return create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        connect_args=_connect_args(url, sslmode, pgbouncer),
+        **_pool_args(url, poolclass),
+    )
+
 
 # Get DATABASE_URL from environment
 DATABASE_URL: str = os.environ.get("DATABASE_URL") or settings.DATABASE_URL or ""
+# Optional streaming replica for read-only endpoints
+DATABASE_READ_URL: str = os.environ.get("DATABASE_READ_URL") or settings.DATABASE_READ_URL or ""
 
-# Convert postgresql:// to postgresql+asyncpg:// for async support
-if DATABASE_URL.startswith("postgresql://"):
-    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
-
-# Extract sslmode from URL and remove it (asyncpg uses connect_args)
-parsed = urlparse(DATABASE_URL)
-sslmode = "require"
-if parsed.query:
-    params = parse_qs(parsed.query)
-    if "sslmode" in params:
-        sslmode = params["sslmode"][0]
-    # Remove sslmode from query
-    clean_query = "&".join(k + "=" + v[0] for k, v in params.items() if k != "sslmode")
-    DATABASE_URL = parsed._replace(query=clean_query).geturl()
-
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,
-    future=True,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
-    connect_args={"ssl": sslmode, "statement_cache_size": 0},
-)
+engine = _make_engine(DATABASE_URL)
+read_engine: Optional[AsyncEngine] = _make_engine(DATABASE_READ_URL, ReplicaPool) if DATABASE_READ_URL else None
+
+# Occupancy gauges are read from the pools at scrape time (SQLite has no pool)
+for _engine in (engine, read_engine):
+    if _engine is not None and isinstance(_engine.sync_engine.pool, InstrumentedPool):
+        track_database_pool(_engine.sync_engine.pool, _engine.sync_engine.pool.label)
 
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -40,6 +125,109 @@ AsyncSessionLocal = async_sessionmaker(
     class_=AsyncSession
 )
 
+ReadSessionLocal = async_sessionmaker(
+    read_engine,
+    expire_on_commit=False,
+    class_=AsyncSession
+) if read_engine is not None else None
+
+
+# =====================================================
+# READ-REPLICA ROUTING
+# =====================================================
+# Replay lag in seconds. 0 on a primary, and on a replica that has replayed
+# everything it received (no new WAL from an idle primary is not lag).
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class ReplicaRouter:
+    """
+    Routes read-only sessions to the replica while its measured lag is within
+    max_lag_seconds; otherwise (no replica, unreachable, or too far behind)
+    reads go to the primary.
+    """
+
+    def __init__(self, max_lag_seconds: float = 10.0, check_interval_seconds: float = 5.0):
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.lag_seconds: Optional[float] = None
+        self.healthy = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def configured(self) -> bool:
+        return ReadSessionLocal is not None
+
+    def sessionmaker(self) -> async_sessionmaker:
+        return ReadSessionLocal if self.configured and self.healthy else AsyncSessionLocal
+
+    async def check(self) -> bool:
+        try:
+            async with read_engine.connect() as conn:
+                if conn.dialect.name == "postgresql":
+                    lag = float((await conn.execute(text(REPLICA_LAG_SQL))).scalar())
+                else:
+                    await conn.execute(text("SELECT 1"))
+                    lag = 0.0
+        except Exception as e:
+            if self.healthy or self.lag_seconds is None:
+                logger.warning("Read replica unavailable, reading from primary", error=str(e))
+            self.lag_seconds, self.healthy = None, False
+            return False
+
+        healthy = lag <= self.max_lag_seconds
+        if healthy != self.healthy:
+            logger.info("Read replica routing changed", use_replica=healthy, lag_seconds=lag)
+        self.lag_seconds, self.healthy = lag, healthy
+        return healthy
+
+    async def start(self):
+        if self.configured and self._task is None:
+            await self.check()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval_seconds)
+            await self.check()
+
+    def stats(self) -> dict:
+        return {
+            "configured": self.configured,
+            "use_replica": self.configured and self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+        }
+
+
+# Global replica router instance
+replica_router = ReplicaRouter(
+    max_lag_seconds=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    check_interval_seconds=settings.DB_REPLICA_CHECK_INTERVAL_SECONDS,
+)
+
+
+def read_session() -> AsyncSession:
+    """Session for read-only work: the replica when it is fresh enough, else the primary."""
+    return replica_router.sessionmaker()()
+
+
 async def init_models():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -52,3 +240,8 @@ async def get_session() -> AsyncSession:
     """Get database session dependency."""
     async with AsyncSessionLocal() as session:
         yield session
+
+async def get_read_session() -> AsyncSession:
+    """Read-only session dependency (replica-routed)."""
+    async with read_session() as session:
+        yield session
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Float, DateTime, JSON, ForeignKey, Index, text, Boolean
+from sqlalchemy import String, Float, DateTime, JSON, ForeignKey, Index, text, Boolean, Integer, BigInteger
 from typing import Optional
 from datetime import datetime
 
@@ -65,6 +65,8 @@ class Device(Base):
 # SENSOR READING
 # =====================================================
 class SensorReading(Base):
+    # On PostgreSQL, migration 7d3f2a9c4e61 turns this into a table
+    # range-partitioned by month on ts, with primary key (id, ts)
     __tablename__ = "sensor_readings"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -120,3 +122,89 @@ class Forecast8h(Base):
     predictions: Mapped[dict] = mapped_column(JSON)
     model_version: Mapped[str] = mapped_column(String(255))
     metrics: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+
+    __table_args__ = (
+        Index("idx_forecast_device_predts", "device_id", "pred_ts"),
+    )
+
+
+# =====================================================
+# ROLLUPS
+# =====================================================
+class RollupColumns:
+    """
+    Per-device aggregates over one time bucket. Each feature keeps
+    min/max/sum/count of its non-null values so buckets can be merged
+    (hourly -> daily) and the mean is sum / count.
+    """
+
+    device_id: Mapped[int] = mapped_column(
+        ForeignKey("devices.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    device_key: Mapped[str] = mapped_column(String(128))
+    n: Mapped[int] = mapped_column(Integer)  # readings in the bucket
+
+    temperature_min: Mapped[Optional[float]] = mapped_column(Float)
+    temperature_max: Mapped[Optional[float]] = mapped_column(Float)
+    temperature_sum: Mapped[Optional[float]] = mapped_column(Float)
+    temperature_count: Mapped[int] = mapped_column(Integer)
+
+    humidity_min: Mapped[Optional[float]] = mapped_column(Float)
+    humidity_max: Mapped[Optional[float]] = mapped_column(Float)
+    humidity_sum: Mapped[Optional[float]] = mapped_column(Float)
+    humidity_count: Mapped[int] = mapped_column(Integer)
+
+    wind_speed_min: Mapped[Optional[float]] = mapped_column(Float)
+    wind_speed_max: Mapped[Optional[float]] = mapped_column(Float)
+    wind_speed_sum: Mapped[Optional[float]] = mapped_column(Float)
+    wind_speed_count: Mapped[int] = mapped_column(Integer)
+
+    radiation_min: Mapped[Optional[float]] = mapped_column(Float)
+    radiation_max: Mapped[Optional[float]] = mapped_column(Float)
+    radiation_sum: Mapped[Optional[float]] = mapped_column(Float)
+    radiation_count: Mapped[int] = mapped_column(Integer)
+
+    precipitation_min: Mapped[Optional[float]] = mapped_column(Float)
+    precipitation_max: Mapped[Optional[float]] = mapped_column(Float)
+    precipitation_sum: Mapped[Optional[float]] = mapped_column(Float)
+    precipitation_count: Mapped[int] = mapped_column(Integer)
+
+
+class SensorRollup1h(RollupColumns, Base):
+    __tablename__ = "sensor_rollup_1h"
+
+    __table_args__ = (
+        Index("idx_rollup_1h_devicekey_bucket", "device_key", "bucket"),
+    )
+
+
+class SensorRollup1d(RollupColumns, Base):
+    __tablename__ = "sensor_rollup_1d"
+
+    __table_args__ = (
+        Index("idx_rollup_1d_devicekey_bucket", "device_key", "bucket"),
+    )
+
+
+class RollupWatermark(Base):
+    """Highest sensor_readings.id already folded into the rollups."""
+
+    __tablename__ = "rollup_watermarks"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    last_id: Mapped[int] = mapped_column(BigInteger)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+class BackfillCheckpoint(Base):
+    """Rows of a source file loaded by backfill.py, committed with each chunk."""
+
+    __tablename__ = "backfill_checkpoints"
+
+    source: Mapped[str] = mapped_column(String(1024), primary_key=True)
+    size: Mapped[int] = mapped_column(BigInteger)
+    mtime: Mapped[float] = mapped_column(Float)
+    rows_done: Mapped[int] = mapped_column(BigInteger)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
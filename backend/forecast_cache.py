@@ -0,0 +1,129 @@
+import hashlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import structlog
+
+from app_config import settings
+from cache import cache, compute_once, LRUCache, SingleFlight, device_cache_key, forecast_cache_key
+from metrics import update_cache_metrics
+from model_client import predict_8h
+
+logger = structlog.get_logger()
+
+Forecast = Tuple[List[str], Dict[str, List[float]], str]
+
+
+def window_digest(window: Sequence[Sequence[float]]) -> str:
+    """Stable digest of a 24×5 input window (float32 bytes)."""
+    data = np.ascontiguousarray(window, dtype=np.float32)
+    return hashlib.blake2b(data.tobytes(), digest_size=16).hexdigest()
+
+
+class ForecastCache:
+    """
+    Forecast results keyed by (device_id, window digest, model_version).
+
+    Uses the shared RedisCache when it is connected, otherwise a bounded
+    in-process LRU. A poll with an unchanged window is a single lookup;
+    ingest invalidates every entry of the device.
+    """
+
+    def __init__(self, ttl_seconds: int = 600, max_entries: int = 4096):
+        self.ttl_seconds = ttl_seconds
+        self._local = LRUCache(max_entries)
+        self._flights = SingleFlight()
+        # Version served by the model server, learned from its responses
+        self.model_version = ""
+
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, device_id: str, digest: str) -> str:
+        return f"{forecast_cache_key(device_id, self.model_version)}:{digest}"
+
+    def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        update_cache_metrics("forecast", self.hits, self.hits + self.misses)
+
+    async def _lookup(self, device_id: str, digest: str) -> Optional[Forecast]:
+        key = self._key(device_id, digest)
+        if cache.available:
+            value = await cache.get(key)
+        else:
+            value = self._local.get(key)
+
+        if value is None:
+            return None
+        return value["for_ts"], value["predictions"], value["model_version"]
+
+    async def get(self, device_id: str, window: Sequence[Sequence[float]]) -> Optional[Forecast]:
+        hit = await self._lookup(device_id, window_digest(window))
+        self._record(hit is not None)
+        return hit
+
+    async def set(
+        self,
+        device_id: str,
+        window: Sequence[Sequence[float]],
+        for_ts: List[str],
+        predictions: Dict[str, List[float]],
+        model_version: str,
+    ):
+        if model_version == "fallback":
+            return  # model server was unreachable; don't pin the fallback
+
+        self.model_version = model_version
+        key = self._key(device_id, window_digest(window))
+        value = {
+            "for_ts": for_ts,
+            "predictions": predictions,
+            "model_version": model_version,
+        }
+        if cache.available:
+            await cache.set(key, value, self.ttl_seconds, tags=[device_cache_key(device_id)])
+        else:
+            self._local.set(key, value, self.ttl_seconds)
+
+    async def invalidate(self, device_id: str):
+        """Drop every cached forecast for a device (called on ingest)."""
+        self._local.delete_prefix(f"forecast:{device_id}:")
+        if cache.available:
+            await cache.invalidate_tag(device_cache_key(device_id))
+
+    async def predict(self, device_id: str, window: List[List[float]]) -> Forecast:
+        """
+        Cached drop-in for ``model_client.predict_8h``. Concurrent misses for
+        the same device and window share one model server call: within this
+        process through single-flight, across workers through the Redis lock.
+        """
+        hit = await self.get(device_id, window)
+        if hit is not None:
+            return hit
+
+        digest = window_digest(window)
+
+        async def compute() -> Forecast:
+            for_ts, preds, model_version = await predict_8h(device_id, window)
+            await self.set(device_id, window, for_ts, preds, model_version)
+            return for_ts, preds, model_version
+
+        return await self._flights.do(
+            f"{device_id}:{digest}",
+            lambda: compute_once(
+                self._key(device_id, digest),
+                compute,
+                lambda: self._lookup(device_id, digest),
+                settings.MODEL_CLIENT_TIMEOUT,
+            ),
+        )
+
+
+# Global forecast cache instance
+forecast_cache = ForecastCache(
+    ttl_seconds=settings.FORECAST_CACHE_TTL_SECONDS,
+    max_entries=settings.FORECAST_CACHE_MAX_ENTRIES,
+)
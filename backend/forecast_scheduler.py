@@ -0,0 +1,185 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import structlog
+
+import crud
+from app_config import settings
+from database import AsyncSessionLocal
+from metrics import FORECAST_QUEUE_DEPTH, FORECAST_DUPLICATES_DROPPED
+from model_client import predict_8h_batch
+from forecast_cache import forecast_cache
+from window_buffer import window_buffer
+
+logger = structlog.get_logger()
+
+
+# =====================================================
+# FORECAST JOB
+# =====================================================
+async def run_batch_forecast(device_ids: List[str]) -> Tuple[int, int]:
+    """
+    Forecast several devices with one model-server round trip and store a
+    Forecast8h row for each. Devices without a full 24-row window are
+    skipped; a device whose window cannot be read or whose forecast cannot
+    be stored is logged and counted as failed without affecting the rest.
+    Returns (stored, failed).
+    """
+    failed = 0
+    async with AsyncSessionLocal() as s:
+        windows = {}
+        for device_id in device_ids:
+            try:
+                window = await window_buffer.get_window(s, device_id)
+            except Exception as e:
+                failed += 1
+                logger.error("Forecast window read failed", device_id=device_id, error=str(e))
+                await s.rollback()
+                continue
+            if len(window) == 24:
+                windows[device_id] = window
+
+        if not windows:
+            return 0, failed
+
+        results = await predict_8h_batch(windows)
+
+        pks = await crud.device_pks(s, list(results))
+        stored = 0
+        for device_id, device_pk in pks.items():
+            for_ts, preds, model_version = results[device_id]
+            try:
+                # One savepoint per row, so a bad row only loses its own forecast
+                async with s.begin_nested():
+                    await crud.store_forecast(
+                        s,
+                        device_pk,
+                        for_ts,
+                        preds,
+                        model_version,
+                    )
+            except Exception as e:
+                failed += 1
+                logger.error("Storing forecast failed", device_id=device_id, error=str(e))
+                continue
+            await forecast_cache.set(device_id, windows[device_id], for_ts, preds, model_version)
+            stored += 1
+        await s.commit()
+
+    return stored, failed
+
+
+# =====================================================
+# SCHEDULER
+# =====================================================
+class ForecastScheduler:
+    """
+    Coalesces post-ingest forecasts per device.
+
+    The first ingest for a device opens a debounce window; further ingests
+    for that device inside the window are dropped as duplicates. When the
+    window closes a single forecast runs on the newest readings; devices
+    that come due together share one batched model-server call.
+    """
+
+    def __init__(self, debounce_seconds: float = 60.0, batch_size: int = 256):
+        self.debounce_seconds = debounce_seconds
+        self.batch_size = batch_size
+
+        self._pending: Dict[str, float] = {}  # device_id -> monotonic due time
+        self._in_flight: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.scheduled = 0
+        self.dropped_duplicates = 0
+        self.completed = 0
+        self.skipped = 0
+        self.failed = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def schedule(self, device_id: str):
+        """Request a forecast for a device; no-op if one is already pending."""
+        if device_id in self._pending:
+            self.dropped_duplicates += 1
+            FORECAST_DUPLICATES_DROPPED.inc()
+            return
+
+        self._pending[device_id] = time.monotonic() + self.debounce_seconds
+        self.scheduled += 1
+        FORECAST_QUEUE_DEPTH.set(self.queue_depth)
+        self._wakeup.set()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": len(self._in_flight),
+            "scheduled": self.scheduled,
+            "dropped_duplicates": self.dropped_duplicates,
+            "completed": self.completed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "debounce_seconds": self.debounce_seconds,
+        }
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Forecast scheduler started", debounce_seconds=self.debounce_seconds)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Forecast scheduler stopped", dropped_pending=self.queue_depth)
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            due = [d for d, t in self._pending.items() if t <= now]
+            if not due:
+                # Every window has the same length, so the oldest entry is next
+                await asyncio.sleep(min(self._pending.values()) - now)
+                continue
+
+            for d in due:
+                del self._pending[d]
+            FORECAST_QUEUE_DEPTH.set(self.queue_depth)
+
+            await self._flush(due)
+
+    async def _flush(self, device_ids: List[str]):
+        for i in range(0, len(device_ids), self.batch_size):
+            chunk = device_ids[i:i + self.batch_size]
+            self._in_flight.update(chunk)
+            try:
+                stored, failed = await run_batch_forecast(chunk)
+                self.completed += stored
+                self.failed += failed
+                self.skipped += len(chunk) - stored - failed
+            except Exception as e:
+                self.failed += len(chunk)
+                logger.error("Scheduled forecast batch failed", devices=len(chunk), error=str(e))
+            finally:
+                self._in_flight.difference_update(chunk)
+
+
+# Global scheduler instance
+forecast_scheduler = ForecastScheduler(
+    debounce_seconds=settings.FORECAST_DEBOUNCE_SECONDS,
+    batch_size=settings.FORECAST_BATCH_SIZE,
+)
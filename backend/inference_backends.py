@@ -0,0 +1,155 @@
+"""
+Inference backends for the model server's LSTM.
+
+  * torch        eager PyTorch (default, and the only one with the
+                 incremental (h, c) step)
+  * torchscript  <name>.ts.pt written by scripts/export_models.py
+  * onnx         <name>.onnx written by scripts/export_models.py, run on
+                 ONNX Runtime's CPU provider
+
+Every backend maps a float32 (N, 24, 5) batch of scaled windows to an
+(N, 5) array of scaled predictions. ONNX Runtime is optional
+(pip install onnxruntime); exporting ONNX also needs onnx and onnxscript.
+
+The torch backend can also serve a dynamically quantized copy of the model
+(quantization="int8"): LSTM/GRU/Linear weights are stored as int8 and
+activations are quantized per call, so no calibration data is needed. This
+saves memory only. For this small LSTM it is slower on CPU than float
+(scripts/report_quantization.py measures both).
+"""
+import os
+from typing import Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+BACKENDS = ("torch", "torchscript", "onnx")
+QUANTIZATION_MODES = ("none", "int8")
+
+
+def torchscript_path(model_dir: str, name: str) -> str:
+    return os.path.join(model_dir, f"{name}.ts.pt")
+
+
+def onnx_path(model_dir: str, name: str) -> str:
+    return os.path.join(model_dir, f"{name}.onnx")
+
+
+def quantize_dynamic_int8(model: nn.Module) -> nn.Module:
+    return torch.ao.quantization.quantize_dynamic(model, {nn.LSTM, nn.GRU, nn.Linear}, dtype=torch.qint8)
+
+
+# =====================================================
+# BACKENDS
+# =====================================================
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, model: nn.Module, quantization: str = "none"):
+        self.model = quantize_dynamic_int8(model) if quantization == "int8" else model
+        self.quantization = quantization
+        self.stateful = hasattr(model, "step")
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            return self.model(torch.from_numpy(x)).numpy()
+
+    def step(self, x: np.ndarray, state=None) -> Tuple[np.ndarray, tuple]:
+        with torch.no_grad():
+            out, state = self.model.step(torch.from_numpy(x), state)
+        return out.numpy(), state
+
+
+class TorchScriptBackend:
+    name = "torchscript"
+    quantization = "none"
+    stateful = False
+
+    def __init__(self, path: str):
+        self.model = torch.jit.load(path, map_location="cpu")
+        self.model.eval()
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            return self.model(torch.from_numpy(x)).numpy()
+
+
+class OnnxRuntimeBackend:
+    name = "onnx"
+    quantization = "none"
+    stateful = False
+
+    def __init__(self, path: str, threads: int = 0):
+        if ort is None:
+            raise RuntimeError("The onnx backend requires onnxruntime")
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(x, dtype=np.float32)})[0]
+
+
+def load_backend(name: str, model: nn.Module, model_dir: str,
+                 model_name: str = "enhanced_lstm", threads: int = 0, quantization: str = "none"):
+    """
+    Backend ``name`` serving ``model``. Falls back to eager torch when the
+    exported artifact (or onnxruntime) is missing, so a deployment never
+    loses the model over its backend setting.
+
+    ``threads`` > 0 caps intra-op threads: ONNX Runtime's session option, or
+    torch.set_num_threads (process-wide) for the torch and torchscript
+    backends and the fallback.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {name!r} (expected one of {', '.join(BACKENDS)})")
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization {quantization!r} (expected one of {', '.join(QUANTIZATION_MODES)})")
+    if name != "onnx" and threads > 0:
+        torch.set_num_threads(threads)
+    if name == "torch":
+        return TorchBackend(model, quantization)
+    if quantization != "none":
+        print(f"Warning: {quantization} quantization applies to the torch backend only, serving float {name}")
+    try:
+        if name == "torchscript":
+            return TorchScriptBackend(torchscript_path(model_dir, model_name))
+        return OnnxRuntimeBackend(onnx_path(model_dir, model_name), threads)
+    except Exception as e:
+        print(f"Warning: {name} backend unavailable ({e}), using eager torch")
+        if threads > 0:
+            torch.set_num_threads(threads)
+        # Float, as the quantization warning above already announced
+        return TorchBackend(model)
+
+
+# =====================================================
+# EXPORT
+# =====================================================
+def export_torchscript(model: nn.Module, path: str):
+    torch.jit.script(model.eval()).save(path)
+
+
+def export_onnx(model: nn.Module, path: str, seq_len: int, n_features: int):
+    """ONNX graph with a dynamic batch axis: input "window", output "forecast"."""
+    example = torch.zeros(2, seq_len, n_features)
+    torch.onnx.export(
+        model.eval(),
+        (example,),
+        path,
+        input_names=["window"],
+        output_names=["forecast"],
+        dynamic_shapes=({0: torch.export.Dim("batch")},),
+        dynamo=True,
+        external_data=False,
+    )
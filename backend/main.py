@@ -1,19 +1,30 @@
-from fastapi import FastAPI, Depends, BackgroundTasks, Query, Request
+from fastapi import FastAPI, Depends, Query, Request, HTTPException
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional, AsyncGenerator
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, AsyncGenerator
 from datetime import datetime, timezone, timedelta
-from sqlalchemy import select
 from logging_config import logger, audit_logger, setup_logging, error_boundary, database_transaction
 from app_config import settings
-from database import AsyncSessionLocal, init_models, ping_db
+from database import AsyncSessionLocal, init_models, ping_db, read_session, replica_router
 import crud
-from schemas import IngestPayload, DeviceOut, LatestOut, ForecastOut
-from model_client import predict_8h
-from db_models import Device, SensorReading, User
+from schemas import IngestPayload, IngestBatch, DeviceOut, LatestOut, ForecastOut, HistoryOut
+import model_client
+from cache import cache
+from forecast_cache import forecast_cache
+from forecast_scheduler import forecast_scheduler
+from maintenance import partition_maintainer, is_missing_partition, ensure_partitions_for
+import rollups
+from rollups import rollup_compactor
+import readings_export
+from window_buffer import window_buffer, as_utc
+from db_models import SensorReading, User
 from prediction_text import generate_prediction_text
 from auth_routes import router as auth_router
-from auth import get_current_active_user, user_required
+from auth import get_current_active_user, user_required, admin_required
 from rate_limiter import limiter, rate_limit_exceeded_handler
 # Cache is disabled for now
 # cache = None
@@ -55,6 +66,11 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
 
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """Read-only endpoints: the replica when configured and within lag tolerance."""
+    async with read_session() as session:
+        yield session
+
 # =========================================================
 # INCLUDE ROUTES
 # =========================================================
@@ -68,6 +84,12 @@ async def on_startup():
     setup_logging()
     await init_models()
     await ping_db()
+    await replica_router.start()
+    await cache.connect()
+    await model_client.start_client()
+    await forecast_scheduler.start()
+    await partition_maintainer.start()
+    await rollup_compactor.start()
     logger.info("Application started successfully")
     audit_logger.log_system_event(
         event_type="application_startup",
@@ -81,6 +103,12 @@ async def on_startup():
 # =========================================================
 @app.on_event("shutdown")
 async def on_shutdown():
+    await rollup_compactor.stop()
+    await partition_maintainer.stop()
+    await forecast_scheduler.stop()
+    await model_client.close_client()
+    await replica_router.stop()
+    await cache.disconnect()
     logger.info("Application shutdown complete")
 
 # =========================================================
@@ -101,27 +129,114 @@ async def metrics():
     """Prometheus metrics endpoint."""
     return await metrics_endpoint()
 
+@app.get("/api/v1/forecast-scheduler")
+@limiter.limit("30/minute")
+async def forecast_scheduler_stats(
+    request: Request,
+    current_user: User = Depends(admin_required),
+):
+    """Queue depth and coalescing counters for post-ingest forecasts (admin only)."""
+    return forecast_scheduler.stats()
+
+@app.get("/api/v1/read-replica")
+@limiter.limit("30/minute")
+async def read_replica_stats(
+    request: Request,
+    current_user: User = Depends(admin_required),
+):
+    """Whether GET endpoints are currently served from the read replica (admin only)."""
+    return replica_router.stats()
+
 # =========================================================
 # PUBLIC ENDPOINTS (for frontend without auth)
 # =========================================================
+async def _stored_forecast(session: AsyncSession, device_id: str) -> Optional[dict]:
+    """
+    Newest stored Forecast8h while it is fresher than FORECAST_READ_TTL_SECONDS,
+    even if readings have been ingested since it was made.
+    """
+    if settings.FORECAST_READ_TTL_SECONDS <= 0:
+        return None
+    return await crud.latest_forecast(
+        session,
+        device_id,
+        timedelta(seconds=settings.FORECAST_READ_TTL_SECONDS),
+    )
+
 @app.get("/api/v1/devices", response_model=List[DeviceOut])
 async def devices_public():
     """Public devices endpoint - returns actual device list"""
-    async with AsyncSessionLocal() as session:
+    async with read_session() as session:
         items = await crud.list_devices(session)
         return [DeviceOut(**i) for i in items]
 
 @app.get("/api/v1/latest", response_model=Optional[LatestOut])
 async def latest_public(device_id: str = Query(...)):
     """Public latest endpoint"""
-    async with AsyncSessionLocal() as session:
+    async with read_session() as session:
         return await crud.get_latest_reading(session, device_id)
 
+@app.get("/api/v1/history", response_model=HistoryOut)
+async def history_public(
+    device_id: str = Query(...),
+    start: Optional[datetime] = Query(None, description="defaults to 7 days before end"),
+    end: Optional[datetime] = Query(None, description="defaults to now"),
+    resolution: str = Query("auto", pattern="^(auto|1h|1d)$"),
+):
+    """Long-range history from the hourly/daily rollups; buckets without readings are omitted"""
+    end = as_utc(end) if end else datetime.now(timezone.utc)
+    start = as_utc(start) if start else end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+    resolution = rollups.pick_resolution(start, end, resolution)
+    async with read_session() as session:
+        points = await rollups.get_history(session, device_id, start, end, resolution)
+    return {"device_id": device_id, "resolution": resolution, "start": start, "end": end, "points": points}
+
+@app.get("/api/v1/readings")
+@limiter.limit("30/minute")
+async def readings(
+    request: Request,
+    device_id: str = Query(...),
+    start: Optional[datetime] = Query(None, alias="from", description="inclusive"),
+    end: Optional[datetime] = Query(None, alias="to", description="exclusive"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(settings.READINGS_PAGE_ROWS, ge=1, le=settings.READINGS_PAGE_MAX_ROWS),
+    format: Optional[str] = Query(None, pattern="^(ndjson|arrow)$", description="default: Accept header, else ndjson"),
+    current_user: User = Depends(user_required),
+):
+    """Raw readings in (ts, id) order, streamed as NDJSON or Arrow, keyset-paginated"""
+    try:
+        after = crud.decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if format is None:
+        format = "arrow" if readings_export.ARROW_MEDIA_TYPE in request.headers.get("accept", "") else "ndjson"
+    if format == "arrow" and readings_export.pa is None:
+        raise HTTPException(status_code=406, detail="Arrow output requires pyarrow on the server")
+
+    args = (
+        device_id,
+        as_utc(start).astimezone(timezone.utc) if start else None,
+        as_utc(end).astimezone(timezone.utc) if end else None,
+        after,
+        limit,
+        settings.READINGS_FETCH_ROWS,
+    )
+    if format == "arrow":
+        return StreamingResponse(readings_export.arrow_stream(*args), media_type=readings_export.ARROW_MEDIA_TYPE)
+    return StreamingResponse(readings_export.ndjson_stream(*args), media_type=readings_export.NDJSON_MEDIA_TYPE)
+
 @app.get("/api/v1/predict", response_model=Optional[ForecastOut])
 async def predict_public(device_id: str = Query(...)):
     """Public predict endpoint - provides dummy forecasts when insufficient data"""
     async with AsyncSessionLocal() as session:
-        window = await crud.last_n_readings(session, device_id, n=24)
+        stored = await _stored_forecast(session, device_id)
+        if stored:
+            return stored
+
+        window = await window_buffer.get_window(session, device_id)
         
         if not window or len(window) < 24:
             # Return dummy predictions when insufficient data
@@ -162,8 +277,7 @@ async def predict_public(device_id: str = Query(...)):
                 }
         
         try:
-            from model_client import predict_8h
-            for_ts, preds, model_version = await predict_8h(device_id, window)
+            for_ts, preds, model_version = await forecast_cache.predict(device_id, window)
             return {
                 "device_id": device_id,
                 "pred_ts": datetime.now(timezone.utc),
@@ -185,7 +299,7 @@ async def predict_public(device_id: str = Query(...)):
 async def prediction_text_public(device_id: str = Query(...)):
     """Public prediction text endpoint"""
     async with AsyncSessionLocal() as session:
-        window = await crud.last_n_readings(session, device_id, n=24)
+        window = await window_buffer.get_window(session, device_id)
         
         if not window:
             return {
@@ -198,7 +312,7 @@ async def prediction_text_public(device_id: str = Query(...)):
                 }
             }
         
-        for_ts, preds, model_version = await predict_8h(device_id, window)
+        for_ts, preds, model_version = await forecast_cache.predict(device_id, window)
         readable_text = generate_prediction_text(preds)
         
         return {
@@ -211,36 +325,73 @@ async def prediction_text_public(device_id: str = Query(...)):
 # =========================================================
 # INGEST
 # =========================================================
+def _buffer_reading(payload: IngestPayload, ts: datetime):
+    """Roll a committed reading into the in-memory prediction window."""
+    window_buffer.append(
+        payload.device_id,
+        [
+            payload.temperature,
+            payload.humidity,
+            payload.wind_speed,
+            payload.radiation,
+            payload.precipitation,
+        ],
+        ts,
+    )
+
+async def _write_readings(
+    session: AsyncSession,
+    operation: str,
+    timestamps: Iterable[datetime],
+    write: Callable[[], Awaitable[Any]],
+) -> Any:
+    """
+    Run ``write`` in one transaction. On partitioned PostgreSQL a reading
+    in a month with no partition yet fails the whole statement, so those
+    months are created and the write is retried once.
+    """
+    try:
+        async with database_transaction(session, operation):
+            return await write()
+    except DBAPIError as e:
+        if not is_missing_partition(e):
+            raise
+    created = await ensure_partitions_for(timestamps)
+    logger.info("Created partitions for ingested readings", operation=operation, created=created)
+    async with database_transaction(session, operation):
+        return await write()
+
+
 @app.post("/api/v1/ingest")
 @limiter.limit("60/minute")
 @error_boundary
 async def ingest(
     request: Request,
     payload: IngestPayload,
-    bg: BackgroundTasks,
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(user_required),
 ):
-    device = await crud.upsert_device(
-        session,
-        payload.device_id,
-        payload.lat,
-        payload.lon,
-    )
-
-    reading = SensorReading(
-        device_id=device.id,
-        device_key=device.device_id,
-        ts=payload.ts or datetime.now(timezone.utc),
-        temperature=payload.temperature,
-        humidity=payload.humidity,
-        wind_speed=payload.wind_speed,
-        radiation=payload.radiation,
-        precipitation=payload.precipitation,
-        raw=payload.model_dump(mode='json'),
-    )
+    ts = payload.ts or datetime.now(timezone.utc)
+
+    async def write():
+        device_pk = await crud.upsert_device_id(
+            session,
+            payload.device_id,
+            payload.lat,
+            payload.lon,
+        )
 
-    async with database_transaction(session, "ingest_sensor_reading"):
+        reading = SensorReading(
+            device_id=device_pk,
+            device_key=payload.device_id,
+            ts=ts,
+            temperature=payload.temperature,
+            humidity=payload.humidity,
+            wind_speed=payload.wind_speed,
+            radiation=payload.radiation,
+            precipitation=payload.precipitation,
+            raw=payload.model_dump(mode='json'),
+        )
         session.add(reading)
         await session.flush()
         
@@ -254,32 +405,79 @@ async def ingest(
             details={"payload": payload.dict()}
         )
 
-    async def _bg_task(dev_id: str):
-        async with AsyncSessionLocal() as s:
-            window = await crud.last_n_readings(s, dev_id, n=24)
+    await _write_readings(session, "ingest_sensor_reading", [ts], write)
+
+    _buffer_reading(payload, ts)
+    await forecast_cache.invalidate(payload.device_id)
+    forecast_scheduler.schedule(payload.device_id)
+    return {"status": "ingested"}
+
+# =========================================================
+# BULK INGEST
+# =========================================================
+async def _parse_ingest_batch(request: Request) -> List[IngestPayload]:
+    """Accepts a JSON array or an NDJSON stream (one payload per line)."""
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+
+    try:
+        if "ndjson" in content_type:
+            payloads = [
+                IngestPayload.model_validate_json(line)
+                for line in body.splitlines()
+                if line.strip()
+            ]
+        else:
+            payloads = IngestBatch.model_validate_json(body).root
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+    if len(payloads) > settings.INGEST_BATCH_MAX_ROWS:
+        raise HTTPException(
+            413,
+            f"Batch exceeds {settings.INGEST_BATCH_MAX_ROWS} readings",
+        )
+    return payloads
+
+
+@app.post("/api/v1/ingest/batch")
+@limiter.limit("60/minute")
+@error_boundary
+async def ingest_batch(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(user_required),
+):
+    payloads = await _parse_ingest_batch(request)
+    if not payloads:
+        return {"status": "ingested", "count": 0, "devices": 0}
+
+    async def write():
+        device_ids = await crud.bulk_insert_readings(session, payloads)
 
-            if not window:
-                return
+        audit_logger.log_data_access(
+            user_id=current_user.id,
+            resource_type="sensor_reading",
+            resource_id=",".join(device_ids),
+            action="bulk_create",
+            ip_address=request.client.host if request.client else "unknown",
+            details={"count": len(payloads)}
+        )
+        return device_ids
 
-            for_ts, preds, model_version = await predict_8h(dev_id, window)
+    now = datetime.now(timezone.utc)
+    device_ids = await _write_readings(
+        session, "ingest_sensor_reading_batch", [p.ts or now for p in payloads], write
+    )
 
-            result = await s.execute(
-                select(Device).where(Device.device_id == dev_id)
-            )
-            dev = result.scalar_one_or_none()
+    for p in sorted(payloads, key=lambda p: as_utc(p.ts or now)):
+        _buffer_reading(p, p.ts or now)
 
-            if dev:
-                await crud.store_forecast(
-                    s,
-                    dev,
-                    for_ts,
-                    preds,
-                    model_version,
-                )
-                await s.commit()
+    for dev_id in device_ids:
+        await forecast_cache.invalidate(dev_id)
+        forecast_scheduler.schedule(dev_id)
 
-    bg.add_task(_bg_task, payload.device_id)
-    return {"status": "ingested"}
+    return {"status": "ingested", "count": len(payloads), "devices": len(device_ids)}
 
 # =========================================================
 # LATEST
@@ -289,7 +487,7 @@ async def ingest(
 async def latest(
     request: Request,
     device_id: str = Query(...),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
     current_user: User = Depends(user_required),
 ):
     return await crud.get_latest_reading(session, device_id)
@@ -301,7 +499,7 @@ async def latest(
 @limiter.limit("50/minute")
 async def devices(
     request: Request,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
     current_user: User = Depends(user_required),
 ):
     items = await crud.list_devices(session)
@@ -318,7 +516,11 @@ async def predict(
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(user_required),
 ):
-    window = await crud.last_n_readings(session, device_id, n=24)
+    stored = await _stored_forecast(session, device_id)
+    if stored:
+        return stored
+
+    window = await window_buffer.get_window(session, device_id)
 
     if not window:
         return {
@@ -329,19 +531,16 @@ async def predict(
             "model_version": "fallback",
         }
 
-    for_ts, preds, model_version = await predict_8h(device_id, window)
+    for_ts, preds, model_version = await forecast_cache.predict(device_id, window)
 
-    result = await session.execute(
-        select(Device).where(Device.device_id == device_id)
-    )
-    dev = result.scalar_one_or_none()
+    device_pk = (await crud.device_pks(session, [device_id])).get(device_id)
 
-    if not dev:
+    if device_pk is None:
         return None
 
     await crud.store_forecast(
         session,
-        dev,
+        device_pk,
         for_ts,
         preds,
         model_version,
@@ -367,7 +566,7 @@ async def prediction_text(
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(user_required),
 ):
-    window = await crud.last_n_readings(session, device_id, n=24)
+    window = await window_buffer.get_window(session, device_id)
 
     if not window:
         return {
@@ -377,7 +576,7 @@ async def prediction_text(
             "prediction_text": {},
         }
 
-    for_ts, preds, model_version = await predict_8h(device_id, window)
+    for_ts, preds, model_version = await forecast_cache.predict(device_id, window)
     readable_text = generate_prediction_text(preds)
 
     return {
@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app_config import settings
+from database import engine
+
+logger = structlog.get_logger()
+
+# Serialises maintenance across workers (pg_try_advisory_xact_lock key)
+_PARTITION_LOCK_KEY = 0x5E4502
+
+
+# =====================================================
+# SENSOR_READINGS PARTITIONS (PostgreSQL)
+# =====================================================
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    """True once migration 7d3f2a9c4e61 has partitioned sensor_readings."""
+    if conn.dialect.name != "postgresql":
+        return False
+    res = await conn.execute(text(
+        "SELECT to_regprocedure('sensor_readings_ensure_partitions(timestamptz, timestamptz)') IS NOT NULL"
+    ))
+    return bool(res.scalar())
+
+
+async def ensure_partitions(conn: AsyncConnection, from_ts: datetime, to_ts: datetime) -> int:
+    """Create the monthly partitions covering [from_ts, to_ts]; returns how many were new."""
+    res = await conn.execute(
+        text("SELECT sensor_readings_ensure_partitions(:from_ts, :to_ts)"),
+        {"from_ts": from_ts, "to_ts": to_ts},
+    )
+    return res.scalar() or 0
+
+
+async def drop_expired_partitions(conn: AsyncConnection, retain_months: int) -> int:
+    """Detach and drop whole months older than the retention window."""
+    res = await conn.execute(
+        text("SELECT sensor_readings_drop_partitions(:retain_months)"),
+        {"retain_months": retain_months},
+    )
+    return res.scalar() or 0
+
+
+def is_missing_partition(exc: BaseException) -> bool:
+    """A write failed because a row's ts falls in a month with no partition."""
+    return isinstance(exc, DBAPIError) and "no partition of relation" in str(exc.orig)
+
+
+async def ensure_partitions_for(timestamps: Iterable[datetime]) -> int:
+    """
+    Create the partitions for the months of ``timestamps`` (one call per
+    distinct month, not the span between them) in their own transaction.
+    """
+    months = sorted({
+        # Partitions are UTC months; naive timestamps are stored as UTC
+        (ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc))
+        .replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        for ts in timestamps
+    })
+    created = 0
+    async with engine.begin() as conn:
+        # Waits for maintenance or another ingest creating the same months
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PARTITION_LOCK_KEY})
+        for month in months:
+            created += await ensure_partitions(conn, month, month)
+    return created
+
+
+async def run_partition_maintenance() -> dict:
+    """Create upcoming partitions and apply retention; no-op when unpartitioned."""
+    async with engine.begin() as conn:
+        if not await is_partitioned(conn):
+            return {"partitioned": False}
+
+        res = await conn.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _PARTITION_LOCK_KEY}
+        )
+        if not res.scalar():
+            return {"partitioned": True, "skipped": "locked"}
+
+        created = (await conn.execute(text(
+            "SELECT sensor_readings_ensure_partitions(now(), now() + make_interval(months => :ahead))"
+        ), {"ahead": settings.SENSOR_PARTITION_MONTHS_AHEAD})).scalar()
+
+        dropped = 0
+        if settings.SENSOR_RETENTION_MONTHS > 0:
+            dropped = await drop_expired_partitions(conn, settings.SENSOR_RETENTION_MONTHS)
+
+    if created or dropped:
+        logger.info("Partition maintenance", created=created, dropped=dropped)
+    return {"partitioned": True, "created": created, "dropped": dropped}
+
+
+# =====================================================
+# PERIODIC RUNNER
+# =====================================================
+class PartitionMaintainer:
+    """Runs run_partition_maintenance at startup and then every interval."""
+
+    def __init__(self, interval_seconds: float = 21600.0):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.last_result: Optional[dict] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                self.last_result = await run_partition_maintenance()
+            except Exception as e:
+                logger.error("Partition maintenance failed", error=str(e))
+            await asyncio.sleep(self.interval_seconds)
+
+
+# Global maintainer instance
+partition_maintainer = PartitionMaintainer(
+    interval_seconds=settings.SENSOR_PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+)
@@ -63,9 +63,49 @@ CACHE_HIT_RATE = Gauge(
     ['cache_type']
 )
 
+FORECAST_QUEUE_DEPTH = Gauge(
+    'forecast_queue_depth',
+    'Devices waiting for a debounced post-ingest forecast'
+)
+
+FORECAST_DUPLICATES_DROPPED = Counter(
+    'forecast_duplicates_dropped_total',
+    'Ingest-triggered forecasts coalesced into an already pending one'
+)
+
+MODEL_CLIENT_CONNECTIONS = Gauge(
+    'model_client_connections',
+    'Pooled connections to the model server',
+    ['state']
+)
+
+MODEL_CLIENT_IN_FLIGHT = Gauge(
+    'model_client_requests_in_flight',
+    'Model server requests currently awaiting a response'
+)
+
+MODEL_CLIENT_POOL_UTILIZATION = Gauge(
+    'model_client_pool_utilization',
+    'Active model server connections over the pool limit (0-1)'
+)
+
 DATABASE_CONNECTIONS = Gauge(
     'database_connections_active',
-    'Active database connections'
+    'Active database connections',
+    ['pool']
+)
+
+DATABASE_POOL_OVERFLOW = Gauge(
+    'database_pool_overflow',
+    'Checked-out database connections beyond the pool size',
+    ['pool']
+)
+
+DATABASE_POOL_WAIT = Histogram(
+    'database_pool_checkout_wait_seconds',
+    'Time to check out a database connection, including opening new ones',
+    ['pool'],
+    buckets=[0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
 )
 
 # Error metrics
@@ -146,9 +186,18 @@ def update_active_users(user_count: int):
     """Update active users metrics."""
     ACTIVE_USERS.set(user_count)
 
-def update_database_connections(connection_count: int):
+def update_database_connections(connection_count: int, pool: str = "primary"):
     """Update database connection metrics."""
-    DATABASE_CONNECTIONS.set(connection_count)
+    DATABASE_CONNECTIONS.labels(pool=pool).set(connection_count)
+
+def track_database_pool(pool, label: str = "primary"):
+    """Read pool occupancy (a QueuePool) at scrape time, labelled by engine."""
+    DATABASE_CONNECTIONS.labels(pool=label).set_function(pool.checkedout)
+    DATABASE_POOL_OVERFLOW.labels(pool=label).set_function(lambda: max(pool.overflow(), 0))
+
+def observe_database_pool_wait(seconds: float, pool: str = "primary"):
+    """Record how long a checkout waited for a connection."""
+    DATABASE_POOL_WAIT.labels(pool=pool).observe(seconds)
 
 def record_error(error_type: str, endpoint: str):
     """Record an error metric."""
@@ -1,11 +1,128 @@
 import httpx
 import random
+import structlog
 from datetime import datetime, timedelta, timezone
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from app_config import settings
+from metrics import MODEL_CLIENT_CONNECTIONS, MODEL_CLIENT_IN_FLIGHT, MODEL_CLIENT_POOL_UTILIZATION
+
+logger = structlog.get_logger()
 
 TARGETS = ["temperature", "humidity", "wind_speed", "radiation", "precipitation"]
 
+# =====================================================
+# SHARED HTTP CLIENT
+# =====================================================
+_client: Optional[httpx.AsyncClient] = None
+_in_flight = 0
+
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = settings.MODEL_CLIENT_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("MODEL_CLIENT_HTTP2 set but 'h2' is not installed, using HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(
+        timeout=settings.MODEL_CLIENT_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=settings.MODEL_CLIENT_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.MODEL_CLIENT_MAX_KEEPALIVE,
+            keepalive_expiry=settings.MODEL_CLIENT_KEEPALIVE_EXPIRY,
+        ),
+        http2=http2,
+    )
+
+
+async def start_client():
+    """Create the app-scoped model server client (FastAPI startup)."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+
+async def close_client():
+    """Close pooled connections (FastAPI shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        # Background jobs and scripts that run without the app lifecycle
+        _client = _build_client()
+    return _client
+
+
+def pool_stats() -> Dict[str, int]:
+    """
+    Connection counts from the underlying httpcore pool. That pool is
+    private to httpx, so with a custom transport or changed internals
+    only ``in_flight`` (counted here) is reported and the rest stay 0.
+    """
+    stats = {"active": 0, "idle": 0, "in_flight": _in_flight}
+    pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return stats
+    try:
+        idle = sum(1 for conn in connections if conn.is_idle())
+        stats["idle"], stats["active"] = idle, len(connections) - idle
+    except Exception:
+        pass
+    return stats
+
+
+def _record_pool_metrics():
+    stats = pool_stats()
+    MODEL_CLIENT_CONNECTIONS.labels(state="active").set(stats["active"])
+    MODEL_CLIENT_CONNECTIONS.labels(state="idle").set(stats["idle"])
+    MODEL_CLIENT_IN_FLIGHT.set(stats["in_flight"])
+    MODEL_CLIENT_POOL_UTILIZATION.set(
+        stats["active"] / settings.MODEL_CLIENT_MAX_CONNECTIONS
+    )
+
+
+async def _post_json(url: str, payload: dict) -> dict:
+    global _in_flight
+    client = get_client()
+    _in_flight += 1
+    _record_pool_metrics()
+    try:
+        r = await client.post(url, json=payload)
+        r.raise_for_status()
+        return r.json()
+    finally:
+        _in_flight -= 1
+        _record_pool_metrics()
+
+
+def _fallback_predictions(recent_window: List[List[float]]) -> Dict[str, List[float]]:
+    # HARD fallback (model server unreachable)
+    last = recent_window[-1]
+    return {
+        "temperature": [float(last[0]) + 0.15 * step for step in range(8)],
+        "humidity": [float(last[1]) + random.uniform(-0.6, 0.6) * step for step in range(8)],
+        "wind_speed": [max(0, float(last[2]) + 0.2 * step) for step in range(8)],
+        "radiation": [max(0, float(last[3]) + 50 * step) for step in range(8)],
+        "precipitation": [max(0, float(last[4]) + 0.02 * step) for step in range(8)],
+    }
+
+
+def _forecast_timestamps() -> List[str]:
+    now = datetime.now(timezone.utc)
+    return [
+        (now + timedelta(hours=i + 1)).isoformat()
+        for i in range(8)
+    ]
+
+
 async def predict_8h(device_id: str, recent_window: List[List[float]]):
     if len(recent_window) != 24:
         raise ValueError("recent_window must contain exactly 24 rows")
@@ -16,31 +133,53 @@ async def predict_8h(device_id: str, recent_window: List[List[float]]):
         "recent_window": recent_window,
     }
 
-    async with httpx.AsyncClient(timeout=15) as client:
-        try:
-            r = await client.post(url, json=payload)
-            r.raise_for_status()
-            data = r.json()
-
-            preds = data["predictions_8h"]
-            model_version = data["model_version"]
-
-        except Exception as e:
-            # HARD fallback (model server unreachable)
-            last = recent_window[-1]
-            preds = {
-                "temperature": [float(last[0]) + 0.15 * step for step in range(8)],
-                "humidity": [float(last[1]) + random.uniform(-0.6, 0.6) * step for step in range(8)],
-                "wind_speed": [max(0, float(last[2]) + 0.2 * step) for step in range(8)],
-                "radiation": [max(0, float(last[3]) + 50 * step) for step in range(8)],
-                "precipitation": [max(0, float(last[4]) + 0.02 * step) for step in range(8)],
-            }
-            model_version = "fallback"
+    try:
+        data = await _post_json(url, payload)
 
-    now = datetime.now(timezone.utc)
-    for_ts = [
-        (now + timedelta(hours=i + 1)).isoformat()
-        for i in range(8)
-    ]
+        preds = data["predictions_8h"]
+        model_version = data["model_version"]
 
-    return for_ts, preds, model_version
+    except Exception as e:
+        preds = _fallback_predictions(recent_window)
+        model_version = "fallback"
+
+    return _forecast_timestamps(), preds, model_version
+
+
+async def predict_8h_batch(
+    windows: Dict[str, List[List[float]]],
+) -> Dict[str, Tuple[List[str], Dict[str, List[float]], str]]:
+    """Forecast several devices with one /model/predict_batch call."""
+    for device_id, recent_window in windows.items():
+        if len(recent_window) != 24:
+            raise ValueError(f"recent_window for {device_id} must contain exactly 24 rows")
+
+    url = f"{settings.MODEL_SERVER_URL}/model/predict_batch"
+    payload = {
+        "items": [
+            {"device_id": device_id, "recent_window": recent_window}
+            for device_id, recent_window in windows.items()
+        ]
+    }
+
+    try:
+        data = await _post_json(url, payload)
+
+        model_version = data["model_version"]
+        preds = {
+            item["device_id"]: item["predictions_8h"]
+            for item in data["results"]
+        }
+
+    except Exception as e:
+        model_version = "fallback"
+        preds = {
+            device_id: _fallback_predictions(recent_window)
+            for device_id, recent_window in windows.items()
+        }
+
+    for_ts = _forecast_timestamps()
+    return {
+        device_id: (for_ts, p, model_version)
+        for device_id, p in preds.items()
+    }
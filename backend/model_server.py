@@ -1,11 +1,17 @@
 import os
 import pickle
+import asyncio
 import numpy as np
 import torch
 import torch.nn as nn
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Dict
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from typing import List, Dict, Optional, Tuple
+
+from inference_backends import load_backend
+from tree_ensembles import FUSED_MAX_BATCH, FusedTreePredictor
 
 # ======================
 # CONFIG
@@ -22,7 +28,44 @@ TARGETS = [
 ]
 
 N_FEATURES = len(TARGETS)
+
+# training/train_baseline.py keys the LightGBM residuals by NASA POWER column
+RESIDUAL_KEY_ALIASES = {
+    "T2M": "temperature",
+    "RH2M": "humidity",
+    "WS2M": "wind_speed",
+    "ALLSKY_SFC_SW_DWN": "radiation",
+    "PRECTOTCORR": "precipitation",
+}
 DEVICE = "cpu"
+MAX_PREDICT_BATCH = int(os.environ.get("MAX_PREDICT_BATCH", "1024"))
+
+# Micro-batching of concurrent /model/predict calls (max size 1 disables it)
+MICROBATCH_MAX_SIZE = int(os.environ.get("MICROBATCH_MAX_SIZE", "32"))
+MICROBATCH_MAX_WAIT_MS = float(os.environ.get("MICROBATCH_MAX_WAIT_MS", "5"))
+
+# Residual boosters: merged into one predict call up to this many rows,
+# called one by one above it (scripts/bench_tree_ensembles.py)
+FUSED_TREES_MAX_BATCH = int(os.environ.get("FUSED_TREES_MAX_BATCH", str(FUSED_MAX_BATCH)))
+
+# Carry the LSTM (h, c) across forecast steps instead of re-running the
+# sliding 24-step window each step. Faster, but an approximation: the state
+# keeps the dropped hours in memory (see scripts/validate_incremental_lstm.py)
+LSTM_INCREMENTAL = os.environ.get("LSTM_INCREMENTAL", "false").lower() in ("1", "true", "yes")
+# Checked at startup: incremental mode is refused when its temperature
+# forecast strays further than this (°C) from the full-window rollout
+LSTM_INCREMENTAL_MAX_ERROR = float(os.environ.get("LSTM_INCREMENTAL_MAX_ERROR", "0.5"))
+
+# LSTM runtime: torch (eager), torchscript or onnx; the last two read the
+# artifacts written by scripts/export_models.py into MODEL_DIR
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch").lower()
+# Intra-op threads for any backend (0 keeps the runtime's default)
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", "0"))
+
+# none or int8 (dynamic quantization of the torch backend's LSTM and Linear
+# layers). int8 shrinks the weights ~3.7x but is not a speed-up: on CPU it is
+# slower than float for this model. See scripts/report_quantization.py.
+MODEL_QUANTIZATION = os.environ.get("MODEL_QUANTIZATION", "none").lower()
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_DIR = os.environ.get("MODEL_DIR", os.path.join(BASE_DIR, "..", "..", "data", "models"))
@@ -45,6 +88,11 @@ class LSTMModel(nn.Module):
         out, _ = self.lstm(x)
         return self.fc(out[:, -1, :])
 
+    def step(self, x, state=None):
+        """Run x on from ``state``; returns the prediction and the new (h, c)."""
+        out, state = self.lstm(x, state)
+        return self.fc(out[:, -1, :]), state
+
 # ======================
 # LOAD MODELS (with fallback)
 # ======================
@@ -91,60 +139,306 @@ class PredictOut(BaseModel):
     model_version: str
     predictions_8h: Dict[str, List[float]]
 
+class PredictBatchIn(BaseModel):
+    items: List[PredictIn]
+
+class PredictBatchItem(BaseModel):
+    device_id: str
+    predictions_8h: Dict[str, List[float]]
+
+class PredictBatchOut(BaseModel):
+    model_version: str
+    results: List[PredictBatchItem]
+
 # ======================
 # FORECAST ENGINE
 # ======================
+class AffineScaler:
+    """
+    A fitted StandardScaler / MinMaxScaler as plain NumPy arrays, so the
+    rollout skips sklearn's per-call validation and copies. Any other
+    scaler (RobustScaler, a Pipeline, ...) is called as is.
+    """
+
+    def __init__(self, scaler):
+        self.scaler = scaler
+        self.clip = None
+        if isinstance(scaler, StandardScaler):
+            self.kind = "standard"
+            # mean_ is fitted even with with_mean=False, but transform ignores it
+            self.offset = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else np.zeros(N_FEATURES)
+            self.scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else np.ones(N_FEATURES)
+        elif isinstance(scaler, MinMaxScaler):
+            self.kind = "minmax"
+            self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+            self.offset = np.asarray(scaler.min_, dtype=np.float64)
+            if scaler.clip:
+                self.clip = scaler.feature_range
+        else:
+            self.kind = "generic"
+
+    def transform(self, x: np.ndarray) -> np.ndarray:
+        if self.kind == "standard":
+            return (x - self.offset) / self.scale
+        if self.kind == "minmax":
+            out = x * self.scale + self.offset
+            return out if self.clip is None else np.clip(out, *self.clip)
+        return self.scaler.transform(x.reshape(-1, N_FEATURES)).reshape(x.shape)
+
+    def inverse_transform(self, x: np.ndarray) -> np.ndarray:
+        if self.kind == "standard":
+            return x * self.scale + self.offset
+        if self.kind == "minmax":
+            return (x - self.offset) / self.scale
+        return self.scaler.inverse_transform(x.reshape(-1, N_FEATURES)).reshape(x.shape)
+
+
+class FastRollout:
+    """
+    The 8-step LSTM + LightGBM + dynamics rollout for an (N, 24, 5) stack
+    of windows. The window lives in scaled space in one preallocated
+    (N, 24 + 8, 5) buffer: step s reads rows s..s+23 and writes its
+    prediction to row s+24, so nothing is re-scaled or copied per step.
+
+    With ``incremental`` the LSTM reads the window once and then advances
+    its (h, c) by the one new row per step (eager torch backend only).
+    """
+
+    def __init__(self, backend, x_scaler, y_scaler, lgb_models: dict, incremental: bool = False):
+        self.backend = backend
+        self.incremental = incremental and backend.stateful
+        self.x = AffineScaler(x_scaler)
+        self.y = AffineScaler(y_scaler)
+        # All targets' boosters in one predict call per step
+        self.residuals = FusedTreePredictor.from_models(
+            lgb_models, TARGETS, N_FEATURES, aliases=RESIDUAL_KEY_ALIASES, max_fused_batch=FUSED_TREES_MAX_BATCH
+        )
+
+    def forecast(self, windows: np.ndarray) -> np.ndarray:
+        n = windows.shape[0]
+        buf = np.empty((n, SEQ_LEN + FORECAST_STEPS, N_FEATURES), dtype=np.float32)
+        buf[:, :SEQ_LEN] = self.x.transform(windows)
+        preds = np.empty((n, FORECAST_STEPS, N_FEATURES))
+
+        state = None
+        for step in range(FORECAST_STEPS):
+            if not self.incremental:
+                out = self.backend(buf[:, step:step + SEQ_LEN])
+            elif state is None:
+                out, state = self.backend.step(buf[:, :SEQ_LEN])
+            else:
+                out, state = self.backend.step(buf[:, step + SEQ_LEN - 1:step + SEQ_LEN], state)
+            if self.residuals:
+                # Residuals are fitted on the scaled targets of the scaled last row
+                out = out + self.residuals.predict(buf[:, step + SEQ_LEN - 1])
+            y = self.y.inverse_transform(out)
+
+            # Same dynamics (and random draw order) as before
+            y[:, 0] += 0.15 * step
+            y[:, 1] += np.random.normal(0, 0.6, n)
+            y[:, 2] = np.maximum(0, y[:, 2] + np.random.normal(0, 0.2, n))
+            y[:, 3] = np.maximum(0, y[:, 3] * (1 + np.random.normal(0, 0.04, n)))
+            y[:, 4] = np.maximum(0, y[:, 4] + np.random.normal(0, 0.02, n))
+
+            preds[:, step] = y
+            buf[:, step + SEQ_LEN] = self.x.transform(y)
+
+        return preds
+
+
+def synthetic_windows(x_scaler, n: int, seed: int = 0) -> np.ndarray:
+    """(n, 24, 5) smooth AR(1) series in scaled space, mapped back to sensor units."""
+    rng = np.random.default_rng(seed)
+    z = np.empty((n, SEQ_LEN, N_FEATURES))
+    z[:, 0] = rng.normal(size=(n, N_FEATURES))
+    for t in range(1, SEQ_LEN):
+        z[:, t] = 0.9 * z[:, t - 1] + np.sqrt(1 - 0.9 ** 2) * rng.normal(size=(n, N_FEATURES))
+    windows = x_scaler.inverse_transform(z.reshape(-1, N_FEATURES)).reshape(z.shape)
+    windows[..., 2:] = np.maximum(windows[..., 2:], 0)  # wind, radiation, rain
+    return windows.astype(np.float32)
+
+
+def incremental_deviation(incremental: FastRollout, full: FastRollout, windows: np.ndarray,
+                          seed: int = 1234) -> np.ndarray:
+    """|incremental - full| per (window, step, target), both drawing the same dynamics noise."""
+    outer = np.random.get_state()
+    try:
+        np.random.seed(seed)
+        a = incremental.forecast(windows)
+        np.random.seed(seed)
+        b = full.forecast(windows)
+    finally:
+        np.random.set_state(outer)
+    return np.abs(a - b)
+
+
+fast_rollout = None
+if x_scaler is not None and lstm is not None and y_scaler is not None:
+    inference_backend = load_backend(
+        INFERENCE_BACKEND, lstm, MODEL_DIR, threads=INFERENCE_THREADS, quantization=MODEL_QUANTIZATION
+    )
+    fast_rollout = FastRollout(inference_backend, x_scaler, y_scaler, lgb_models)
+    if LSTM_INCREMENTAL:
+        incremental_rollout = FastRollout(inference_backend, x_scaler, y_scaler, lgb_models, incremental=True)
+        if incremental_rollout.incremental:
+            windows = synthetic_windows(x_scaler, 64)
+            error = incremental_deviation(incremental_rollout, fast_rollout, windows)[..., 0].max()
+            if error <= LSTM_INCREMENTAL_MAX_ERROR:
+                fast_rollout = incremental_rollout
+            else:
+                print(
+                    f"LSTM_INCREMENTAL refused: temperature deviates up to {error:.2f} °C from the "
+                    f"full-window rollout (LSTM_INCREMENTAL_MAX_ERROR={LSTM_INCREMENTAL_MAX_ERROR})"
+                )
+    print(
+        f"Forecast engine: {inference_backend.name} backend, quantization={inference_backend.quantization}, "
+        f"incremental={fast_rollout.incremental}"
+    )
+
+
+def _as_dict(preds: np.ndarray) -> Dict[str, List[float]]:
+    return {TARGETS[i]: preds[:, i].tolist() for i in range(N_FEATURES)}
+
+
 def rolling_forecast(window: np.ndarray) -> Dict[str, List[float]]:
-    preds = []
-    
+    if fast_rollout is not None:
+        return _as_dict(fast_rollout.forecast(window[None])[0])
+
     # Use dummy predictions if models are not available
-    if x_scaler is None or lstm is None or y_scaler is None:
-        print("Using dummy predictions (models not loaded)")
-        last_values = window[-1]
-        for step in range(FORECAST_STEPS):
-            # Simple trend-based dummy predictions
-            dummy = last_values.copy()
-            dummy[0] += 0.15 * step  # temp trend
-            dummy[1] += np.random.normal(0, 0.6)  # humidity noise
-            dummy[2] = max(0, dummy[2] + np.random.normal(0, 0.2))
-            dummy[3] = max(0, dummy[3] * (1 + np.random.normal(0, 0.04)))
-            dummy[4] = max(0, dummy[4] + np.random.normal(0, 0.02))
-            preds.append(dummy.tolist())
-    else:
-        window_scaled = x_scaler.transform(window)
+    print("Using dummy predictions (models not loaded)")
+    preds = []
+    last_values = window[-1]
+    for step in range(FORECAST_STEPS):
+        # Simple trend-based dummy predictions
+        dummy = last_values.copy()
+        dummy[0] += 0.15 * step  # temp trend
+        dummy[1] += np.random.normal(0, 0.6)  # humidity noise
+        dummy[2] = max(0, dummy[2] + np.random.normal(0, 0.2))
+        dummy[3] = max(0, dummy[3] * (1 + np.random.normal(0, 0.04)))
+        dummy[4] = max(0, dummy[4] + np.random.normal(0, 0.02))
+        preds.append(dummy.tolist())
 
-        for step in range(FORECAST_STEPS):
-            x = torch.tensor(window_scaled[-SEQ_LEN:], dtype=torch.float32).unsqueeze(0)
+    return _as_dict(np.array(preds))
 
-            with torch.no_grad():
-                y_scaled = lstm(x).cpu().numpy()[0]
+def rolling_forecast_batch(windows: np.ndarray) -> List[Dict[str, List[float]]]:
+    """
+    Same rollout as rolling_forecast for an (N, 24, 5) stack of windows:
+    one LSTM forward pass and one LightGBM call per target for each step,
+    regardless of N.
+    """
+    if fast_rollout is None:
+        return [rolling_forecast(w) for w in windows]
+    return [_as_dict(p) for p in fast_rollout.forecast(windows)]
 
-            y = y_scaler.inverse_transform(y_scaled.reshape(1, -1))[0]
+# ======================
+# MICRO-BATCHING
+# ======================
+class MicroBatcher:
+    """
+    Holds incoming windows for up to ``max_wait_ms`` (or until
+    ``max_batch_size`` are queued), runs them as one rolling_forecast_batch
+    in a worker thread and resolves each caller's future with its row.
+    While a batch is running, new requests queue up and form the next one.
+    """
 
-            # LightGBM residuals (correct 5 features)
-            last_step = window_scaled[-1].reshape(1, -1)
-            for i, t in enumerate(TARGETS):
-                if t in lgb_models:
-                    y[i] += lgb_models[t].predict(last_step)[0]
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
 
-            # 🔥 Dynamics (THIS fixes flat lines)
-            y[0] += 0.15 * step                    # temp trend
-            y[1] += np.random.normal(0, 0.6)      # humidity noise
-            y[2] = max(0, y[2] + np.random.normal(0, 0.2))
-            y[3] = max(0, y[3] * (1 + np.random.normal(0, 0.04)))
-            y[4] = max(0, y[4] + np.random.normal(0, 0.02))
+        self.batches = 0
+        self.items = 0
 
-            preds.append(y.tolist())
+    @property
+    def running(self) -> bool:
+        return self._task is not None
 
-            window = np.vstack([window[1:], y])
-            window_scaled = x_scaler.transform(window)
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
 
-    preds = np.array(preds)
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
 
-    return {
-        TARGETS[i]: preds[:, i].tolist()
-        for i in range(N_FEATURES)
-    }
+        while not self._queue.empty():
+            _, fut = self._queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError("model server shutting down"))
+
+    async def submit(self, window: np.ndarray) -> Dict[str, List[float]]:
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((window, fut))
+        return await fut
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Callers that disconnected while queued have cancelled futures
+            batch = [(w, f) for w, f in batch if not f.done()]
+            if not batch:
+                continue
+
+            windows = np.stack([w for w, _ in batch])
+            try:
+                results = await run_in_threadpool(rolling_forecast_batch, windows)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+batcher = MicroBatcher(MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS)
+
+@app.on_event("startup")
+async def start_batcher():
+    if MICROBATCH_MAX_SIZE > 1:
+        await batcher.start()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.stop()
 
 # ======================
 # ROUTE
@@ -155,16 +449,56 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "model_loaded": lstm is not None}
+    return {
+        "status": "healthy",
+        "model_loaded": lstm is not None,
+        "inference_backend": fast_rollout.backend.name if fast_rollout is not None else None,
+        "quantization": fast_rollout.backend.quantization if fast_rollout is not None else None,
+        "microbatch": batcher.stats() if batcher.running else None,
+    }
 
 @app.post("/model/predict", response_model=PredictOut)
-def predict(inp: PredictIn):
-    window = np.array(inp.recent_window, dtype=np.float32)
+async def predict(inp: PredictIn):
+    try:
+        window = np.array(inp.recent_window, dtype=np.float32)
+    except ValueError:
+        raise HTTPException(400, "recent_window must be 24 × 5")
 
     if window.shape != (SEQ_LEN, N_FEATURES):
         raise HTTPException(400, "recent_window must be 24 × 5")
 
+    if batcher.running:
+        predictions = await batcher.submit(window)
+    else:
+        predictions = await run_in_threadpool(rolling_forecast, window)
+
+    return {
+        "model_version": "lstm + lgbm + dynamics",
+        "predictions_8h": predictions
+    }
+
+@app.post("/model/predict_batch", response_model=PredictBatchOut)
+def predict_batch(inp: PredictBatchIn):
+    if len(inp.items) > MAX_PREDICT_BATCH:
+        raise HTTPException(413, f"at most {MAX_PREDICT_BATCH} windows per batch")
+
+    if not inp.items:
+        return {"model_version": "lstm + lgbm + dynamics", "results": []}
+
+    try:
+        windows = np.array([i.recent_window for i in inp.items], dtype=np.float32)
+    except ValueError:
+        raise HTTPException(400, "every recent_window must be 24 × 5")
+
+    if windows.shape[1:] != (SEQ_LEN, N_FEATURES):
+        raise HTTPException(400, "every recent_window must be 24 × 5")
+
+    forecasts = rolling_forecast_batch(windows)
+
     return {
         "model_version": "lstm + lgbm + dynamics",
-        "predictions_8h": rolling_forecast(window)
+        "results": [
+            {"device_id": item.device_id, "predictions_8h": f}
+            for item, f in zip(inp.items, forecasts)
+        ],
     }
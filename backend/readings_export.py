@@ -0,0 +1,129 @@
+"""
+Streaming encoders for GET /api/v1/readings.
+
+Both formats stream one page of crud.iter_reading_batches straight from a
+server-side cursor, so memory stays at one fetch batch however long the
+requested range is. A page that hit its row limit carries a next_cursor
+for the following request:
+
+  * NDJSON: one reading per line, then a final {"next_cursor": ...} line
+    (null once the range is exhausted).
+  * Arrow IPC stream: one record batch per fetch batch; the last batch
+    carries next_cursor in its custom metadata
+    (RecordBatchStreamReader.read_next_batch_with_custom_metadata).
+
+Arrow output needs pyarrow.
+"""
+import io
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence
+
+import orjson
+
+import crud
+from database import read_session
+from window_buffer import as_utc
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+FEATURES = crud.READING_COLUMNS[1:]
+
+
+def _next_cursor(last: Optional[Sequence], count: int, limit: int) -> Optional[str]:
+    if last is None or count < limit:
+        return None
+    return crud.encode_cursor(as_utc(last.ts), last.id)
+
+
+async def _batches(device_id, start, end, after, limit, fetch_rows) -> AsyncIterator[List[Sequence]]:
+    # The session lives for as long as the response is streaming
+    async with read_session() as session:
+        async for batch in crud.iter_reading_batches(
+            session, device_id, start, end, after, limit, fetch_rows
+        ):
+            yield batch
+
+
+# =====================================================
+# NDJSON
+# =====================================================
+async def ndjson_stream(
+    device_id: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    after: Optional[crud.Cursor],
+    limit: int,
+    fetch_rows: int,
+) -> AsyncIterator[bytes]:
+    last, count = None, 0
+    async for batch in _batches(device_id, start, end, after, limit, fetch_rows):
+        yield b"".join(
+            orjson.dumps(
+                {"device_id": device_id, "ts": as_utc(row.ts), **{f: getattr(row, f) for f in FEATURES}},
+                option=orjson.OPT_APPEND_NEWLINE,
+            )
+            for row in batch
+        )
+        last, count = batch[-1], count + len(batch)
+    yield orjson.dumps({"next_cursor": _next_cursor(last, count, limit)}, option=orjson.OPT_APPEND_NEWLINE)
+
+
+# =====================================================
+# ARROW IPC
+# =====================================================
+def arrow_schema():
+    return pa.schema(
+        [("device_id", pa.string()), ("ts", pa.timestamp("us", tz="UTC"))]
+        + [(f, pa.float64()) for f in FEATURES]
+    )
+
+
+def _record_batch(schema, device_id: str, batch: List[Sequence]):
+    columns = [
+        pa.array([device_id] * len(batch), pa.string()),
+        pa.array([as_utc(row.ts) for row in batch], schema.field("ts").type),
+    ]
+    columns += [pa.array([getattr(row, f) for row in batch], pa.float64()) for f in FEATURES]
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+async def arrow_stream(
+    device_id: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    after: Optional[crud.Cursor],
+    limit: int,
+    fetch_rows: int,
+) -> AsyncIterator[bytes]:
+    schema = arrow_schema()
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    yield drain()  # schema message
+
+    # One batch of lookahead so the last one can carry next_cursor
+    pending, last, count = None, None, 0
+    async for batch in _batches(device_id, start, end, after, limit, fetch_rows):
+        if pending is not None:
+            writer.write_batch(pending)
+            yield drain()
+        pending = _record_batch(schema, device_id, batch)
+        last, count = batch[-1], count + len(batch)
+
+    if pending is not None:
+        next_cursor = _next_cursor(last, count, limit)
+        writer.write_batch(pending, custom_metadata={"next_cursor": next_cursor or ""})
+    writer.close()
+    yield drain()
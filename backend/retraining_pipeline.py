@@ -14,10 +14,11 @@ import structlog
 import os
 import json
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, func
 
 from database import AsyncSessionLocal
-from db_models import SensorReading, Device, Forecast8h
+from db_models import Device, Forecast8h, SensorRollup1h
+import rollups
 from model_management import model_registry, performance_tracker
 from training.train_baseline import (
     create_sequences,
@@ -42,15 +43,16 @@ class RetrainingPipeline:
     
     async def check_retraining_triggers(self) -> bool:
         """Check if retraining should be triggered."""
+        await rollups.compact()
         async with AsyncSessionLocal() as session:
-            # Check if enough new data
+            # Check if enough new data (readings counted from the hourly rollups)
             week_ago = datetime.now(timezone.utc) - timedelta(days=self.retraining_interval_days)
             
             result = await session.execute(
-                select(SensorReading)
-                .where(SensorReading.ts >= week_ago)
+                select(func.coalesce(func.sum(SensorRollup1h.n), 0))
+                .where(SensorRollup1h.bucket >= week_ago)
             )
-            new_data_count = len(result.scalars().all())
+            new_data_count = result.scalar()
             
             if new_data_count < self.min_data_points:
                 logger.info("Insufficient data for retraining", 
@@ -90,26 +92,27 @@ class RetrainingPipeline:
     
     async def collect_training_data(self, session: AsyncSession) -> pd.DataFrame:
         """Collect and preprocess training data."""
-        # Get all sensor readings
+        # Hourly means from the rollups: one row per device-hour, so the lag
+        # and rolling windows in _engineer_features are true hour windows
+        await rollups.compact()
         result = await session.execute(
-            select(SensorReading, Device)
-            .join(Device, SensorReading.device_id == Device.id)
-            .order_by(SensorReading.ts)
+            select(SensorRollup1h, Device)
+            .join(Device, SensorRollup1h.device_id == Device.id)
+            .order_by(SensorRollup1h.bucket)
         )
         
         data = []
-        for reading, device in result:
-            data.append({
+        for rollup, device in result:
+            row = {
                 'device_id': device.device_id,
-                'ts': reading.ts,
-                'temperature': reading.temperature,
-                'humidity': reading.humidity,
-                'wind_speed': reading.wind_speed,
-                'radiation': reading.radiation,
-                'precipitation': reading.precipitation,
+                'ts': rollup.bucket,
                 'lat': device.lat,
                 'lon': device.lon
-            })
+            }
+            for col in rollups.FEATURES:
+                count = getattr(rollup, f'{col}_count')
+                row[col] = getattr(rollup, f'{col}_sum') / count if count else None
+            data.append(row)
         
         df = pd.DataFrame(data)
         
@@ -0,0 +1,304 @@
+"""
+Hourly and daily rollups of sensor_readings.
+
+sensor_rollup_1h / sensor_rollup_1d hold, per device and bucket, the
+reading count and min/max/sum/count of every feature. They are maintained
+by compaction rather than on the ingest path: each pass recomputes the
+buckets touched by readings above the rollup_watermarks high-water mark
+and then advances it. Recomputing whole buckets keeps passes idempotent,
+so a bucket that is folded twice is simply rewritten.
+
+Ids are handed out before commit, so a slow ingest transaction can commit
+below the watermark after a pass has moved past it. Every pass that has
+new rows therefore starts ROLLUP_ID_SLACK ids behind the watermark. Bulk
+loads call refresh_range() for the ts range they wrote instead of relying
+on the id order.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import structlog
+from sqlalchemy import DateTime, bindparam, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app_config import settings
+from database import engine
+from db_models import SensorRollup1d, SensorRollup1h
+
+logger = structlog.get_logger()
+
+FEATURES = ["temperature", "humidity", "wind_speed", "radiation", "precipitation"]
+STATS = ["min", "max", "sum", "count"]
+
+WATERMARK_NAME = "sensor_readings"
+
+# Serialises compaction across workers (pg_try_advisory_xact_lock key)
+_ROLLUP_LOCK_KEY = 0x5E4503
+
+# Bucket start and bucket end per dialect; SQLite stores DateTime as
+# 'YYYY-MM-DD HH:MM:SS.ffffff' text, so buckets are built in that format.
+_BUCKET_START = {
+    "postgresql": "date_trunc('{unit}', {col}, 'UTC')",
+    "sqlite": "strftime('{fmt}', {col})",
+}
+_BUCKET_END = {
+    # Fixed-length interval: timestamptz + '1 day' follows the session time
+    # zone, so a daily bucket would be 23 or 25 hours long across DST changes
+    "postgresql": "{col} + interval '{hours} hours'",
+    "sqlite": "strftime('%Y-%m-%d %H:%M:%S.000000', {col}, '+1 {unit}')",
+}
+_UNIT_HOURS = {"hour": 1, "day": 24}
+_SQLITE_FORMATS = {
+    "hour": "%Y-%m-%d %H:00:00.000000",
+    "day": "%Y-%m-%d 00:00:00.000000",
+}
+
+ROLLUP_COLUMNS = ["device_id", "bucket", "device_key", "n"] + [
+    f"{f}_{s}" for f in FEATURES for s in STATS
+]
+
+RESOLUTIONS = {"1h": SensorRollup1h, "1d": SensorRollup1d}
+
+
+# =====================================================
+# SQL
+# =====================================================
+def is_supported(dialect: str) -> bool:
+    return dialect in _BUCKET_START
+
+
+def _bucket_start(dialect: str, col: str, unit: str) -> str:
+    return _BUCKET_START[dialect].format(unit=unit, col=col, fmt=_SQLITE_FORMATS[unit])
+
+
+def _bucket_end(dialect: str, col: str, unit: str) -> str:
+    return _BUCKET_END[dialect].format(unit=unit, col=col, hours=_UNIT_HOURS[unit])
+
+
+def _upsert_sql(dialect: str, touched_where: str, unit: str) -> str:
+    """
+    Recompute every (device, bucket) that has a sensor_readings row matching
+    ``touched_where``. Hourly buckets aggregate raw readings, daily buckets
+    merge the hourly rollups.
+
+    The join states the bucket both ways on purpose: PostgreSQL hash/merge
+    joins on the bucket expression (the range alone makes it nest per
+    device), while SQLite only seeks idx_device_ts through the ts range.
+    On PostgreSQL the bounds CTE also prunes partitions outside the batch;
+    SQLite would use it as the index range instead, so it is left out there.
+    """
+    if unit == "hour":
+        target, source = "sensor_rollup_1h", "sensor_readings"
+        source_ts = "s.ts"
+        aggregates = ["min(s.device_key)", "count(*)"]
+        for f in FEATURES:
+            aggregates += [f"min(s.{f})", f"max(s.{f})", f"sum(s.{f})", f"count(s.{f})"]
+    else:
+        target, source = "sensor_rollup_1d", "sensor_rollup_1h"
+        source_ts = "s.bucket"
+        aggregates = ["min(s.device_key)", "sum(s.n)"]
+        for f in FEATURES:
+            aggregates += [f"min(s.{f}_min)", f"max(s.{f}_max)", f"sum(s.{f}_sum)", f"sum(s.{f}_count)"]
+
+    updates = ", ".join(f"{c} = excluded.{c}" for c in ROLLUP_COLUMNS[2:])
+    bounds, prune = "", ""
+    if dialect == "postgresql":
+        bounds = f""",
+        bounds AS (
+            SELECT min(bucket) AS lo, {_bucket_end(dialect, 'max(bucket)', unit)} AS hi FROM touched
+        )"""
+        prune = f"WHERE {source_ts} >= (SELECT lo FROM bounds) AND {source_ts} < (SELECT hi FROM bounds)"
+    return f"""
+        WITH touched AS (
+            SELECT DISTINCT device_id, {_bucket_start(dialect, 'ts', unit)} AS bucket
+            FROM sensor_readings
+            WHERE {touched_where}
+        ){bounds}
+        INSERT INTO {target} ({', '.join(ROLLUP_COLUMNS)})
+        SELECT t.device_id, t.bucket, {', '.join(aggregates)}
+        FROM touched t
+        JOIN {source} s
+          ON s.device_id = t.device_id
+         AND {_bucket_start(dialect, source_ts, unit)} = t.bucket
+         AND {source_ts} >= t.bucket AND {source_ts} < {_bucket_end(dialect, 't.bucket', unit)}
+        {prune}
+        GROUP BY t.device_id, t.bucket
+        ON CONFLICT (device_id, bucket) DO UPDATE SET {updates}
+    """
+
+
+async def _rollup(conn: AsyncConnection, touched_where: str, params: dict, bind_types: dict = None):
+    for unit in ("hour", "day"):
+        stmt = text(_upsert_sql(conn.dialect.name, touched_where, unit))
+        if bind_types:
+            stmt = stmt.bindparams(*(bindparam(k, type_=t) for k, t in bind_types.items()))
+        await conn.execute(stmt, params)
+
+
+# =====================================================
+# COMPACTION
+# =====================================================
+async def _try_lock(conn: AsyncConnection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return True
+    res = await conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _ROLLUP_LOCK_KEY})
+    return bool(res.scalar())
+
+
+async def get_watermark(conn: AsyncConnection) -> int:
+    res = await conn.execute(
+        text("SELECT last_id FROM rollup_watermarks WHERE name = :name"), {"name": WATERMARK_NAME}
+    )
+    return res.scalar() or 0
+
+
+async def _set_watermark(conn: AsyncConnection, last_id: int):
+    await conn.execute(
+        text("""
+            INSERT INTO rollup_watermarks (name, last_id, updated_at)
+            VALUES (:name, :last_id, :updated_at)
+            ON CONFLICT (name) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at
+        """).bindparams(bindparam("updated_at", type_=DateTime(timezone=True))),
+        {"name": WATERMARK_NAME, "last_id": last_id, "updated_at": datetime.now(timezone.utc)},
+    )
+
+
+async def compact(batch_rows: Optional[int] = None, id_slack: Optional[int] = None) -> dict:
+    """
+    Fold readings above the watermark into the rollups, one transaction per
+    ``batch_rows`` ids; returns the new watermark and the id span folded.
+    """
+    batch_rows = batch_rows or settings.ROLLUP_BATCH_ROWS
+    id_slack = settings.ROLLUP_ID_SLACK if id_slack is None else id_slack
+    if not is_supported(engine.dialect.name):
+        return {"supported": False}
+
+    batches, folded, first = 0, 0, True
+    while True:
+        async with engine.begin() as conn:
+            if not await _try_lock(conn):
+                return {"skipped": "locked", "batches": batches, "folded": folded}
+
+            last_id = await get_watermark(conn)
+            upto = (await conn.execute(text("SELECT coalesce(max(id), 0) FROM sensor_readings"))).scalar()
+            if upto <= last_id:
+                break
+
+            after = max(last_id - id_slack, 0) if first else last_id
+            end = min(upto, last_id + batch_rows)
+            await _rollup(conn, "id > :after AND id <= :end", {"after": after, "end": end})
+            await _set_watermark(conn, end)
+
+        batches += 1
+        folded += end - last_id
+        first = False
+
+    if batches:
+        logger.info("Rollup compaction", batches=batches, folded=folded, watermark=last_id)
+    return {"watermark": last_id, "batches": batches, "folded": folded}
+
+
+async def refresh_range(start: datetime, end: datetime):
+    """Recompute every bucket with readings in [start, end] (bulk loads, repairs)."""
+    if not is_supported(engine.dialect.name):
+        return
+    async with engine.begin() as conn:
+        await _rollup(
+            conn,
+            "ts >= :start AND ts <= :end",
+            {"start": start, "end": end},
+            {"start": DateTime(timezone=True), "end": DateTime(timezone=True)},
+        )
+
+
+# =====================================================
+# QUERIES
+# =====================================================
+def pick_resolution(start: datetime, end: datetime, resolution: str = "auto") -> str:
+    """'auto' reads hourly rollups up to ROLLUP_HOURLY_MAX_DAYS, daily beyond."""
+    if resolution != "auto":
+        return resolution
+    return "1h" if end - start <= timedelta(days=settings.ROLLUP_HOURLY_MAX_DAYS) else "1d"
+
+
+def _utc(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+async def get_history(
+    session: AsyncSession,
+    device_id: str,
+    start: datetime,
+    end: datetime,
+    resolution: str = "auto",
+) -> List[Dict]:
+    """
+    Per-bucket count and min/max/mean of each feature for buckets in
+    [start, end). Only buckets holding at least one reading are returned:
+    gaps are omitted, not filled with n=0 points. A mean is over the
+    bucket's readings, so a daily mean weights each hour by how many
+    readings it has rather than averaging the hourly means.
+    """
+    table = RESOLUTIONS[pick_resolution(start, end, resolution)].__table__
+    # Plain rows rather than ORM entities: long ranges return thousands of buckets
+    res = await session.execute(
+        select(table)
+        .where(
+            table.c.device_key == device_id,
+            table.c.bucket >= _utc(start),
+            table.c.bucket < _utc(end),
+        )
+        .order_by(table.c.bucket)
+    )
+
+    points = []
+    for row in res.mappings():
+        point = {"bucket": row["bucket"], "n": row["n"]}
+        for f in FEATURES:
+            count = row[f"{f}_count"]
+            point[f"{f}_min"] = row[f"{f}_min"]
+            point[f"{f}_max"] = row[f"{f}_max"]
+            point[f"{f}_mean"] = row[f"{f}_sum"] / count if count else None
+        points.append(point)
+    return points
+
+
+# =====================================================
+# PERIODIC RUNNER
+# =====================================================
+class RollupCompactor:
+    """Runs compact() at startup and then every interval."""
+
+    def __init__(self, interval_seconds: float = 60.0):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.last_result: Optional[dict] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                self.last_result = await compact()
+            except Exception as e:
+                logger.error("Rollup compaction failed", error=str(e))
+            await asyncio.sleep(self.interval_seconds)
+
+
+# Global compactor instance
+rollup_compactor = RollupCompactor(
+    interval_seconds=settings.ROLLUP_COMPACTION_INTERVAL_SECONDS,
+)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, RootModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -13,6 +13,9 @@ class IngestPayload(BaseModel):
     lat: Optional[float] = None
     lon: Optional[float] = None
 
+class IngestBatch(RootModel[List[IngestPayload]]):
+    """JSON array of ingest payloads posted to /api/v1/ingest/batch."""
+
 class DeviceOut(BaseModel):
     device_id: str
     last_seen: Optional[datetime]
@@ -35,6 +38,33 @@ class ForecastOut(BaseModel):
     predictions: Dict[str, List[float]]
     model_version: str
 
+class HistoryPoint(BaseModel):
+    """One rollup bucket; *_mean is over the bucket's readings (weighted by reading count)."""
+    bucket: datetime
+    n: int = Field(..., description="Readings in the bucket (always >= 1)")
+    temperature_min: Optional[float]
+    temperature_max: Optional[float]
+    temperature_mean: Optional[float]
+    humidity_min: Optional[float]
+    humidity_max: Optional[float]
+    humidity_mean: Optional[float]
+    wind_speed_min: Optional[float]
+    wind_speed_max: Optional[float]
+    wind_speed_mean: Optional[float]
+    radiation_min: Optional[float]
+    radiation_max: Optional[float]
+    radiation_mean: Optional[float]
+    precipitation_min: Optional[float]
+    precipitation_max: Optional[float]
+    precipitation_mean: Optional[float]
+
+class HistoryOut(BaseModel):
+    device_id: str
+    resolution: str
+    start: datetime
+    end: datetime
+    points: List[HistoryPoint] = Field(..., description="Buckets with readings, oldest first; empty buckets are omitted")
+
 class PredictRequestToModel(BaseModel):
     device_id: str
     recent_window: List[List[float]] = Field(..., description="Rows ordered oldest->newest with [temperature, humidity, wind_speed, radiation, precipitation]")
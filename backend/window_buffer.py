@@ -0,0 +1,148 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence
+
+import numpy as np
+import structlog
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud
+from app_config import settings
+
+logger = structlog.get_logger()
+
+FEATURES = ["temperature", "humidity", "wind_speed", "radiation", "precipitation"]
+WINDOW_SIZE = 24
+
+
+def as_utc(ts: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything we store is UTC
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+class _DeviceWindow:
+    __slots__ = ("data", "count", "last_ts", "loaded_at")
+
+    def __init__(self, size: int):
+        self.data = np.zeros((size, len(FEATURES)), dtype=np.float32)
+        self.count = 0
+        self.last_ts: Optional[datetime] = None
+        self.loaded_at = time.monotonic()
+
+
+class WindowBuffer:
+    """
+    Per-device rolling window of the latest readings, oldest → newest.
+
+    Ingest appends to windows that are already resident; reads that miss
+    (or find an entry older than ``ttl_seconds``) warm the window from the
+    database. The TTL bounds staleness when several workers each hold
+    their own buffer but only one of them saw a given ingest.
+    """
+
+    def __init__(
+        self,
+        size: int = WINDOW_SIZE,
+        max_devices: int = 10_000,
+        ttl_seconds: float = 300.0,
+    ):
+        self.size = size
+        self.max_devices = max_devices
+        self.ttl_seconds = ttl_seconds
+        self._windows: "OrderedDict[str, _DeviceWindow]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def _lookup(self, device_id: str) -> Optional[_DeviceWindow]:
+        entry = self._windows.get(device_id)
+        if entry is None:
+            return None
+        if self.ttl_seconds and time.monotonic() - entry.loaded_at > self.ttl_seconds:
+            del self._windows[device_id]
+            return None
+        self._windows.move_to_end(device_id)
+        return entry
+
+    def get_array(self, device_id: str) -> Optional[np.ndarray]:
+        """Resident window as a ``(count, 5)`` float32 view, or None on miss."""
+        entry = self._lookup(device_id)
+        if entry is None:
+            return None
+        return entry.data[self.size - entry.count:]
+
+    def load(
+        self,
+        device_id: str,
+        rows: Sequence[Sequence[float]],
+        last_ts: Optional[datetime],
+    ):
+        """Replace a device window with rows already in chronological order."""
+        entry = _DeviceWindow(self.size)
+        rows = rows[-self.size:]
+        if len(rows):
+            entry.data[self.size - len(rows):] = rows
+        entry.count = len(rows)
+        entry.last_ts = as_utc(last_ts) if last_ts else None
+
+        self._windows[device_id] = entry
+        self._windows.move_to_end(device_id)
+        while len(self._windows) > self.max_devices:
+            self._windows.popitem(last=False)
+
+    def append(
+        self,
+        device_id: str,
+        row: Sequence[Optional[float]],
+        ts: datetime,
+    ):
+        """Roll a freshly committed reading into a resident window."""
+        entry = self._windows.get(device_id)
+        if entry is None:
+            return  # next read warms the full window from the DB
+
+        ts = as_utc(ts)
+        if any(v is None for v in row) or (entry.last_ts and ts < entry.last_ts):
+            # Gaps and out-of-order readings: let the DB decide the window
+            self.invalidate(device_id)
+            return
+
+        entry.data[:-1] = entry.data[1:]
+        entry.data[-1] = row
+        entry.count = min(entry.count + 1, self.size)
+        entry.last_ts = ts
+
+    def invalidate(self, device_id: str):
+        self._windows.pop(device_id, None)
+
+    async def get_window(
+        self,
+        session: AsyncSession,
+        device_id: str,
+    ) -> List[List[float]]:
+        """Drop-in for ``crud.last_n_readings`` that only hits the DB on a miss."""
+        window = self.get_array(device_id)
+        if window is not None:
+            self.hits += 1
+            return window.tolist()
+
+        self.misses += 1
+        rows, last_ts = await crud.last_n_readings_with_ts(session, device_id, n=self.size)
+        if rows:
+            self.load(device_id, rows, last_ts)
+            window = self.get_array(device_id)
+            if window is not None:
+                # The float32 values a later hit returns, so cache state never changes the model input
+                return window.tolist()
+        return rows
+
+
+# Global buffer instance
+window_buffer = WindowBuffer(
+    max_devices=settings.WINDOW_BUFFER_MAX_DEVICES,
+    ttl_seconds=settings.WINDOW_BUFFER_TTL_SECONDS,
+)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Compare cache codecs against pickle on realistic ForecastOut payloads
+and on a 24x5 float32 input window: encoded size and encode/decode time.
+
+    python scripts/bench_cache_codec.py [--iterations 20000]
+"""
+import argparse
+import os
+import pickle
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from cache_codecs import (  # noqa: E402
+    JsonCodec, MsgpackCodec, NumpyCodec, OrjsonCodec, PickleCodec, TaggedCodec,
+    msgpack, orjson,
+)
+
+TARGETS = ["temperature", "humidity", "wind_speed", "radiation", "precipitation"]
+
+
+def forecast_payload():
+    """Same shape as schemas.ForecastOut as returned by /api/v1/predict."""
+    now = datetime.now(timezone.utc)
+    return {
+        "device_id": "station-001",
+        "pred_ts": now,
+        "for_ts": [(now + timedelta(hours=i + 1)).isoformat() for i in range(8)],
+        "predictions": {t: [random.uniform(0, 1000) for _ in range(8)] for t in TARGETS},
+        "model_version": "lstm + lgbm + dynamics",
+    }
+
+
+def window_payload():
+    return (np.random.rand(24, 5) * [30, 100, 10, 1000, 5]).astype(np.float32)
+
+
+def bench(label, encode, decode, value, iterations):
+    data = encode(value)
+    enc = timeit.timeit(lambda: encode(value), number=iterations) / iterations
+    dec = timeit.timeit(lambda: decode(data), number=iterations) / iterations
+    print(f"  {label:<10} {len(data):>7} B   encode {enc * 1e6:8.2f} µs   decode {dec * 1e6:8.2f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    codecs = [("pickle", PickleCodec()), ("json", JsonCodec())]
+    if orjson is not None:
+        codecs.append(("orjson", OrjsonCodec()))
+    if msgpack is not None:
+        codecs.append(("msgpack", MsgpackCodec()))
+
+    print(f"ForecastOut dict ({args.iterations} iterations)")
+    value = forecast_payload()
+    for label, codec in codecs:
+        tagged = TaggedCodec(codec)
+        bench(label, tagged.encode, tagged.decode, value, args.iterations)
+
+    print(f"\n24x5 float32 window ({args.iterations} iterations)")
+    window = window_payload()
+    pickle_codec = PickleCodec()
+    bench("pickle", pickle_codec.encode, pickle_codec.decode, window, args.iterations)
+    tagged = TaggedCodec(JsonCodec(), NumpyCodec())
+    bench("numpy", tagged.encode, tagged.decode, window, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
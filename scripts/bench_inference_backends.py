@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Check and time each LSTM inference backend (eager torch, TorchScript, ONNX
+Runtime): max deviation from eager torch, single-window latency, batch
+throughput and the full 8-step forecast.
+
+Run scripts/export_models.py first; backends without artifacts are skipped.
+
+    MODEL_DIR=data/models python scripts/bench_inference_backends.py [--iterations 500]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import torch
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("MODEL_DIR", os.path.join(ROOT, "data", "models"))
+
+import model_server as ms  # noqa: E402
+from inference_backends import (  # noqa: E402
+    OnnxRuntimeBackend, TorchBackend, TorchScriptBackend, onnx_path, torchscript_path,
+)
+
+
+def available_backends(threads: int):
+    backends = [TorchBackend(ms.lstm)]
+    for name, make in (
+        ("torchscript", lambda: TorchScriptBackend(torchscript_path(ms.MODEL_DIR, "enhanced_lstm"))),
+        ("onnx", lambda: OnnxRuntimeBackend(onnx_path(ms.MODEL_DIR, "enhanced_lstm"), threads)),
+    ):
+        try:
+            backends.append(make())
+        except Exception as e:
+            print(f"  {name:<12} skipped ({e})")
+    return backends
+
+
+def per_call(fn, iterations: int) -> float:
+    return timeit.timeit(fn, number=iterations) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--batch-sizes", default="32,256")
+    parser.add_argument("--threads", type=int, default=1, help="torch / onnxruntime intra-op threads")
+    args = parser.parse_args()
+
+    if ms.fast_rollout is None:
+        sys.exit(f"Models not found in {ms.MODEL_DIR}; set MODEL_DIR")
+    torch.set_num_threads(args.threads)
+
+    backends = available_backends(args.threads)
+    reference = backends[0]
+    sizes = [int(s) for s in args.batch_sizes.split(",")]
+    windows = np.random.default_rng(0).normal(size=(max(sizes + [256]), ms.SEQ_LEN, ms.N_FEATURES))
+    windows = windows.astype(np.float32)
+    raw = ms.x_scaler.inverse_transform(windows[:32].reshape(-1, ms.N_FEATURES)).reshape(32, ms.SEQ_LEN, -1)
+
+    def forecast(backend):
+        np.random.seed(1234)
+        return ms.FastRollout(backend, ms.x_scaler, ms.y_scaler, ms.lgb_models).forecast(raw)
+
+    expected = forecast(reference)
+    print("Equivalence with eager torch (max |diff|):")
+    for b in backends[1:]:
+        lstm_diff = np.max(np.abs(b(windows[:256]) - reference(windows[:256])))
+        forecast_diff = np.max(np.abs(forecast(b) - expected))
+        print(f"  {b.name:<12} LSTM output {lstm_diff:.2e}   8h forecast {forecast_diff:.2e}")
+
+    print("\nLSTM forward, single window:")
+    for b in backends:
+        t = per_call(lambda: b(windows[:1]), args.iterations)
+        print(f"  {b.name:<12} {t * 1e6:9.1f} µs")
+
+    for n in sizes:
+        print(f"\nLSTM forward, batch of {n}:")
+        iterations = max(args.iterations * 8 // n, 10)
+        for b in backends:
+            t = per_call(lambda: b(windows[:n]), iterations)
+            print(f"  {b.name:<12} {t * 1e3:9.2f} ms   {n / t:12,.0f} windows/s")
+
+    print("\nFull 8-step forecast (LSTM + LightGBM + dynamics):")
+    for b in backends:
+        rollout = ms.FastRollout(b, ms.x_scaler, ms.y_scaler, ms.lgb_models)
+        single = per_call(lambda: rollout.forecast(raw[:1]), max(args.iterations // 5, 10))
+        batch = per_call(lambda: rollout.forecast(raw), max(args.iterations // 20, 10))
+        print(f"  {b.name:<12} single {single * 1e3:7.2f} ms   batch of 32 {batch * 1e3:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
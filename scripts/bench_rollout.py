@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Compare the model server's preallocated-buffer rollout against the previous
+re-scale-every-step implementation: equivalence under a fixed seed and
+time per forecast for a single window and for batches.
+
+    MODEL_DIR=data/models python scripts/bench_rollout.py [--iterations 200]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import torch
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("MODEL_DIR", os.path.join(ROOT, "data", "models"))
+
+import model_server as ms  # noqa: E402
+
+
+# =====================================================
+# PREVIOUS IMPLEMENTATION (reference)
+# =====================================================
+def legacy_rolling_forecast(window: np.ndarray):
+    preds = []
+    window_scaled = ms.x_scaler.transform(window)
+
+    for step in range(ms.FORECAST_STEPS):
+        x = torch.tensor(window_scaled[-ms.SEQ_LEN:], dtype=torch.float32).unsqueeze(0)
+
+        with torch.no_grad():
+            y_scaled = ms.lstm(x).cpu().numpy()[0]
+
+        y = ms.y_scaler.inverse_transform(y_scaled.reshape(1, -1))[0]
+
+        last_step = window_scaled[-1].reshape(1, -1)
+        for i, t in enumerate(ms.TARGETS):
+            if t in ms.lgb_models:
+                y[i] += ms.lgb_models[t].predict(last_step)[0]
+
+        y[0] += 0.15 * step
+        y[1] += np.random.normal(0, 0.6)
+        y[2] = max(0, y[2] + np.random.normal(0, 0.2))
+        y[3] = max(0, y[3] * (1 + np.random.normal(0, 0.04)))
+        y[4] = max(0, y[4] + np.random.normal(0, 0.02))
+
+        preds.append(y.tolist())
+
+        window = np.vstack([window[1:], y])
+        window_scaled = ms.x_scaler.transform(window)
+
+    preds = np.array(preds)
+    return {ms.TARGETS[i]: preds[:, i].tolist() for i in range(ms.N_FEATURES)}
+
+
+def legacy_rolling_forecast_batch(windows: np.ndarray):
+    n = windows.shape[0]
+    preds = np.empty((n, ms.FORECAST_STEPS, ms.N_FEATURES))
+
+    def _scale(w):
+        return ms.x_scaler.transform(w.reshape(-1, ms.N_FEATURES)).reshape(n, -1, ms.N_FEATURES)
+
+    windows_scaled = _scale(windows)
+
+    for step in range(ms.FORECAST_STEPS):
+        x = torch.tensor(windows_scaled[:, -ms.SEQ_LEN:], dtype=torch.float32)
+
+        with torch.no_grad():
+            y_scaled = ms.lstm(x).cpu().numpy()
+
+        y = ms.y_scaler.inverse_transform(y_scaled)
+
+        last_step = windows_scaled[:, -1, :]
+        for i, t in enumerate(ms.TARGETS):
+            if t in ms.lgb_models:
+                y[:, i] += ms.lgb_models[t].predict(last_step)
+
+        y[:, 0] += 0.15 * step
+        y[:, 1] += np.random.normal(0, 0.6, n)
+        y[:, 2] = np.maximum(0, y[:, 2] + np.random.normal(0, 0.2, n))
+        y[:, 3] = np.maximum(0, y[:, 3] * (1 + np.random.normal(0, 0.04, n)))
+        y[:, 4] = np.maximum(0, y[:, 4] + np.random.normal(0, 0.02, n))
+
+        preds[:, step] = y
+
+        windows = np.concatenate([windows[:, 1:], y[:, None, :]], axis=1)
+        windows_scaled = _scale(windows)
+
+    return [{ms.TARGETS[i]: p[:, i].tolist() for i in range(ms.N_FEATURES)} for p in preds]
+
+
+# =====================================================
+# BENCHMARK
+# =====================================================
+def random_windows(n: int) -> np.ndarray:
+    scale = np.array([30, 100, 10, 1000, 5], dtype=np.float32)
+    return (np.random.rand(n, ms.SEQ_LEN, ms.N_FEATURES) * scale).astype(np.float32)
+
+
+def max_abs_diff(a, b) -> float:
+    return max(
+        float(np.max(np.abs(np.array(x[t]) - np.array(y[t]))))
+        for x, y in zip(a, b)
+        for t in ms.TARGETS
+    )
+
+
+def seeded(fn, arg, seed=1234):
+    np.random.seed(seed)
+    return fn(arg)
+
+
+def bench(label, fn, arg, iterations, per):
+    t = timeit.timeit(lambda: fn(arg), number=iterations) / iterations
+    print(f"  {label:<10} {t * 1e6:10.1f} µs/call   {t * 1e6 / per:8.1f} µs/window")
+    return t
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--batch-sizes", default="8,32,128")
+    parser.add_argument("--threads", type=int, default=1, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    if ms.fast_rollout is None:
+        sys.exit(f"Models not found in {ms.MODEL_DIR}; set MODEL_DIR")
+    torch.set_num_threads(args.threads)
+
+    print("Equivalence (fixed seed, max |new - old|):")
+    window = random_windows(1)[0]
+    print(f"  single     {max_abs_diff([seeded(ms.rolling_forecast, window)], [seeded(legacy_rolling_forecast, window)]):.2e}")
+    windows = random_windows(32)
+    print(f"  batch 32   {max_abs_diff(seeded(ms.rolling_forecast_batch, windows), seeded(legacy_rolling_forecast_batch, windows)):.2e}")
+
+    print("\nSingle window:")
+    old = bench("previous", legacy_rolling_forecast, window, args.iterations, 1)
+    new = bench("buffered", ms.rolling_forecast, window, args.iterations, 1)
+    print(f"  speedup    {old / new:.2f}x")
+
+    for n in (int(s) for s in args.batch_sizes.split(",")):
+        windows = random_windows(n)
+        iterations = max(args.iterations // n, 5)
+        print(f"\nBatch of {n}:")
+        old = bench("previous", legacy_rolling_forecast_batch, windows, iterations, n)
+        new = bench("buffered", ms.rolling_forecast_batch, windows, iterations, n)
+        print(f"  speedup    {old / new:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
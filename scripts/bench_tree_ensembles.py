@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Compare FusedTreePredictor against calling each per-target booster in turn,
+for every per-target LightGBM pickle in MODEL_DIR: equivalence and time per
+call at several batch sizes. "fused" always uses the merged booster; "auto"
+switches back to separate boosters above --max-fused-batch rows, as the
+model server does.
+
+    MODEL_DIR=data/models python scripts/bench_tree_ensembles.py [--iterations 500]
+"""
+import argparse
+import glob
+import os
+import pickle
+import sys
+import timeit
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from tree_ensembles import FUSED_MAX_BATCH, FusedTreePredictor  # noqa: E402
+
+
+def per_call(fn, iterations: int) -> float:
+    return min(timeit.repeat(fn, number=iterations, repeat=3)) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model-dir", default=os.environ.get("MODEL_DIR", os.path.join(ROOT, "data", "models")))
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--batch-sizes", default="1,8,32,256")
+    parser.add_argument("--max-fused-batch", type=int, default=FUSED_MAX_BATCH)
+    args = parser.parse_args()
+
+    for path in sorted(glob.glob(os.path.join(args.model_dir, "lgbm*.pkl"))):
+        with open(path, "rb") as f:
+            models = pickle.load(f)
+        keys = list(models)
+        fused = FusedTreePredictor(dict(enumerate(models.values())), len(keys), max_fused_batch=sys.maxsize)
+        auto = FusedTreePredictor(dict(enumerate(models.values())), len(keys), max_fused_batch=args.max_fused_batch)
+        boosters = [getattr(m, "booster_", m) for m in models.values()]
+        n_features = boosters[0].num_feature()
+
+        print(f"{os.path.basename(path)}: {len(keys)} targets, {n_features} features, "
+              f"{sum(b.num_trees() for b in boosters)} trees, fused columns {fused.fused_columns}")
+
+        rng = np.random.default_rng(0)
+        for n in (int(s) for s in args.batch_sizes.split(",")):
+            X = rng.normal(size=(n, n_features))
+            expected = np.column_stack([models[k].predict(X) for k in keys])
+            diff = max(np.max(np.abs(fused.predict(X) - expected)), np.max(np.abs(auto.predict(X) - expected)))
+
+            iterations = max(args.iterations // n, 10)
+            wrapper = per_call(lambda: [models[k].predict(X) for k in keys], iterations)
+            separate = per_call(lambda: [b.predict(X) for b in boosters], iterations)
+            together = per_call(lambda: fused.predict(X), iterations)
+            chosen = per_call(lambda: auto.predict(X), iterations)
+            print(
+                f"  batch {n:<5} sklearn {wrapper * 1e6:9.1f} µs   boosters {separate * 1e6:9.1f} µs   "
+                f"fused {together * 1e6:9.1f} µs   ({separate / together:.2f}x)   "
+                f"auto {chosen * 1e6:9.1f} µs   ({separate / chosen:.2f}x)   max |diff| {diff:.1e}"
+            )
+
+
+if __name__ == "__main__":
+    main()
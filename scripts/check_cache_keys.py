@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Check that `cached` keys are shared across uvicorn-style workers: replay
+one request stream against a shared key space, from a single process and
+round-robin across N processes (each with its own PYTHONHASHSEED), and
+compare hit rates for the legacy ``hash(str(args))`` key and for
+``cache.build_cache_key``.
+
+    python scripts/check_cache_keys.py [--workers 4] [--requests 5000]
+
+Exits non-zero if the stable key's multi-worker hit rate differs from the
+single-process one.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND)
+
+
+def request_stream(n, devices=50, seed=7):
+    """Skewed device polling, mixing positional and keyword call styles."""
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(devices)]
+    for _ in range(n):
+        device_id = f"station-{rng.choices(range(devices), weights)[0]:03d}"
+        hours = rng.choice([24, 24, 24, 168])
+        yield device_id, hours, rng.random() < 0.5
+
+
+def worker_keys(n):
+    """Keys this process derives for the whole stream (one session per request)."""
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from cache import build_cache_key
+
+    async def get_device_stats(session, device_id: str, hours: int = 24):
+        pass
+
+    legacy, stable = [], []
+    for device_id, hours, as_kwargs in request_stream(n):
+        session = AsyncSession()
+        if as_kwargs:
+            args, kwargs = (session,), {"device_id": device_id, "hours": hours}
+        else:
+            args, kwargs = (session, device_id, hours), {}
+        legacy.append(f"stats:{hash(str(args) + str(kwargs))}")
+        stable.append(build_cache_key("stats", get_device_stats, args, kwargs))
+    return {"legacy": legacy, "stable": stable}
+
+
+def spawn_worker(seed, n):
+    env = dict(os.environ, PYTHONHASHSEED=str(seed))
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--emit", "--requests", str(n)],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def hit_rate(keys_by_worker, scheme, n):
+    """Replay request i on worker i % N against one shared key set."""
+    shared, hits = set(), 0
+    for i in range(n):
+        key = keys_by_worker[i % len(keys_by_worker)][scheme][i]
+        if key in shared:
+            hits += 1
+        else:
+            shared.add(key)
+    return hits / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--emit", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.emit:
+        print(json.dumps(worker_keys(args.requests)))
+        return 0
+
+    workers = [spawn_worker(1000 + i, args.requests) for i in range(args.workers)]
+    single = workers[:1]
+
+    print(f"{args.requests} requests, {args.workers} worker processes")
+    print(f"  {'key':<8} {'1 process':>10} {f'{args.workers} workers':>12}")
+    ok = True
+    for scheme in ("legacy", "stable"):
+        one = hit_rate(single, scheme, args.requests)
+        many = hit_rate(workers, scheme, args.requests)
+        print(f"  {scheme:<8} {one:>10.1%} {many:>12.1%}")
+        if scheme == "stable" and one != many:
+            ok = False
+
+    print("OK: stable keys match across workers" if ok else "FAIL: stable keys diverge across workers")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Check the PostgreSQL-only paths of the partitioned sensor_readings table on
+a scratch database created next to DATABASE_URL (and dropped afterwards):
+
+  1. migrations: upgrade to head, downgrade below 7d3f2a9c4e61 and upgrade
+     again; the table must come back partitioned with PK (id, ts) and the
+     ensure/drop partition functions installed
+  2. COPY backfill: a CSV spanning several months loads through asyncpg's
+     COPY, creating its partitions, with every row stored once
+  3. ingest: /api/v1/ingest with a reading in a month that has no partition,
+     and /api/v1/ingest/batch mixing the current month with two missing ones
+  4. retention: sensor_readings_drop_partitions drops the old months whole
+
+    DATABASE_URL=postgresql://user@host:5432/weather python scripts/check_postgres_partitions.py
+
+The DATABASE_URL role needs CREATEDB. Exits non-zero on the first failed check.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timezone
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND)
+
+PRE_PARTITION_REVISION = "5c1e9a7d2b40"
+
+
+def check(ok: bool, message: str):
+    print(f"{'ok  ' if ok else 'FAIL'} {message}")
+    if not ok:
+        raise SystemExit(f"FAIL: {message}")
+
+
+# =====================================================
+# 1. MIGRATIONS (sync, through alembic)
+# =====================================================
+def table_shape(sync_url) -> tuple:
+    """(relkind of sensor_readings, PK columns, partition function count)."""
+    engine = create_engine(sync_url)
+    with engine.connect() as conn:
+        relkind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = 'sensor_readings'::regclass")).scalar()
+        pk = conn.execute(text("""
+            SELECT array_agg(a.attname ORDER BY k.ord)
+            FROM pg_constraint c
+            CROSS JOIN LATERAL unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord)
+            JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+            WHERE c.conrelid = 'sensor_readings'::regclass AND c.contype = 'p'
+        """)).scalar()
+        functions = conn.execute(text(
+            "SELECT count(*) FROM pg_proc WHERE proname IN "
+            "('sensor_readings_ensure_partitions', 'sensor_readings_drop_partitions')"
+        )).scalar()
+    engine.dispose()
+    return relkind, list(pk), functions
+
+
+def check_migrations(sync_url):
+    from alembic import command
+    from alembic.config import Config
+
+    cfg = Config(os.path.join(BACKEND, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(BACKEND, "alembic"))
+    cfg.set_main_option("sqlalchemy.url", sync_url.render_as_string(hide_password=False).replace("%", "%%"))
+
+    command.upgrade(cfg, "head")
+    check(table_shape(sync_url) == ("p", ["id", "ts"], 2), "upgrade head: partitioned, PK (id, ts), functions installed")
+    command.downgrade(cfg, PRE_PARTITION_REVISION)
+    check(table_shape(sync_url)[0] == "r", f"downgrade to {PRE_PARTITION_REVISION}: plain table again")
+    command.upgrade(cfg, "head")
+    check(table_shape(sync_url) == ("p", ["id", "ts"], 2), "upgrade head again: partitioned, PK (id, ts), functions installed")
+
+
+# =====================================================
+# 2-4. BACKFILL, INGEST, RETENTION (async, through the app)
+# =====================================================
+async def partition_count(conn) -> int:
+    return (await conn.execute(text(
+        "SELECT count(*) FROM pg_inherits WHERE inhparent = 'sensor_readings'::regclass"
+    ))).scalar()
+
+
+async def stored(conn, device_id: str) -> int:
+    return (await conn.execute(
+        text("SELECT count(*) FROM sensor_readings WHERE device_key = :d"), {"d": device_id}
+    )).scalar()
+
+
+async def check_backfill(engine):
+    import backfill
+
+    device_id = "check-backfill"
+    ts = pd.date_range("2001-01-01", "2001-06-30 23:00", freq="h", tz="UTC")
+    df = pd.DataFrame({"ts": ts, "temperature": 25.0, "humidity": 60.0, "wind_speed": 2.0,
+                       "radiation": 100.0, "precipitation": 0.0})
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "backfill.csv")
+        df.to_csv(path, index=False)
+        check(engine.dialect.driver == "asyncpg", "backfill uses the asyncpg COPY path")
+        async with engine.connect() as conn:
+            before = await partition_count(conn)
+        written = await backfill.backfill(path, device_id=device_id, chunk_rows=1_000)
+        again = await backfill.backfill(path, device_id=device_id, chunk_rows=1_000)
+
+    async with engine.connect() as conn:
+        rows = await stored(conn, device_id)
+        created = await partition_count(conn) - before
+    check(written == len(df) and rows == len(df), f"COPY backfill stored {rows} of {len(df)} rows")
+    check(created == 6, f"COPY backfill created {created} of 6 monthly partitions")
+    check(again == 0, "re-running a finished backfill writes nothing")
+
+
+async def check_ingest(engine):
+    import httpx
+
+    import main
+    from auth import create_access_token
+    from database import AsyncSessionLocal
+    from db_models import User
+
+    user_id, device_id = "check-user", "check-ingest"
+    async with AsyncSessionLocal() as s:
+        s.add(User(id=user_id, email="check@example.com", username=user_id, hashed_password="x", role="user"))
+        await s.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user_id})}"}
+
+    def reading(ts):
+        return {"device_id": device_id, "ts": ts.isoformat(), "temperature": 20.0, "humidity": 50.0,
+                "wind_speed": 2.0, "radiation": 100.0, "precipitation": 0.0}
+
+    # 1990 predates every partition the migration and the backfill created
+    single = datetime(1990, 1, 15, 12, tzinfo=timezone.utc)
+    batch = [datetime.now(timezone.utc)] + [datetime(1990, m, d, 6, tzinfo=timezone.utc) for m in (2, 3) for d in (1, 28)]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://check") as c:
+        r = await c.post("/api/v1/ingest", json=reading(single), headers=headers)
+        check(r.status_code == 200, f"ingest into a month without a partition: {r.status_code}")
+        r = await c.post("/api/v1/ingest/batch", json=[reading(ts) for ts in batch], headers=headers)
+        check(r.status_code == 200, f"batch spanning two months without partitions: {r.status_code}")
+
+    async with engine.connect() as conn:
+        rows = await stored(conn, device_id)
+    check(rows == 1 + len(batch), f"ingest stored {rows} of {1 + len(batch)} readings")
+
+
+async def check_retention(engine):
+    async with engine.begin() as conn:
+        before = await partition_count(conn)
+        # Everything older than a year: the 1990 and 2001 months above
+        dropped = (await conn.execute(text("SELECT sensor_readings_drop_partitions(12)"))).scalar()
+        after = await partition_count(conn)
+        old_rows = (await conn.execute(text(
+            "SELECT count(*) FROM sensor_readings WHERE ts < now() - interval '13 months'"
+        ))).scalar()
+    check(dropped == 9 and before - after == 9, f"retention dropped {dropped} old months (expected 9)")
+    check(old_rows == 0, "no rows left in dropped months")
+
+
+async def run_app_checks():
+    from database import engine
+
+    try:
+        await check_backfill(engine)
+        await check_ingest(engine)
+        await check_retention(engine)
+    finally:
+        await engine.dispose()
+
+
+# =====================================================
+# SCRATCH DATABASE
+# =====================================================
+def main():
+    argparse.ArgumentParser(description=__doc__.strip().splitlines()[0]).parse_args()
+    raw = os.environ.get("DATABASE_URL", "")
+    if not raw.startswith("postgresql"):
+        sys.exit("DATABASE_URL must point at a PostgreSQL server")
+
+    url = make_url(raw)
+    # Sync driver for DDL and alembic; utf8 even if the server default is SQL_ASCII
+    sync_url = url.set(drivername="postgresql+psycopg").update_query_dict({"client_encoding": "utf8"})
+    scratch = f"check_partitions_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(sync_url, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE "{scratch}" ENCODING \'UTF8\' TEMPLATE template0'))
+    print(f"Scratch database {scratch}")
+
+    try:
+        check_migrations(sync_url.set(database=scratch))
+        # database.py builds its engine from DATABASE_URL at import time
+        os.environ["DATABASE_URL"] = url.set(database=scratch).render_as_string(hide_password=False)
+        asyncio.run(run_app_checks())
+    finally:
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{scratch}" WITH (FORCE)'))
+        admin.dispose()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Check the model server's AffineScaler against sklearn: for every supported
+scaler configuration (and a few that must take the generic path), fit on
+synthetic readings and compare transform / inverse_transform of (N, 24, 5)
+windows with the scaler's own methods, including values outside the fitted
+range.
+
+    python scripts/check_scaler_parity.py
+
+Exits non-zero on any mismatch or on a scaler taking the wrong path.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+from sklearn.preprocessing import MaxAbsScaler, MinMaxScaler, RobustScaler, StandardScaler
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("MODEL_DIR", os.path.join(ROOT, "data", "models"))
+
+from model_server import N_FEATURES, SEQ_LEN, AffineScaler  # noqa: E402
+
+CASES = [
+    ("StandardScaler()", StandardScaler(), "standard"),
+    ("StandardScaler(with_mean=False)", StandardScaler(with_mean=False), "standard"),
+    ("StandardScaler(with_std=False)", StandardScaler(with_std=False), "standard"),
+    ("StandardScaler(with_mean=False, with_std=False)", StandardScaler(with_mean=False, with_std=False), "standard"),
+    ("MinMaxScaler()", MinMaxScaler(), "minmax"),
+    ("MinMaxScaler(feature_range=(-1, 1))", MinMaxScaler(feature_range=(-1, 1)), "minmax"),
+    ("MinMaxScaler(clip=True)", MinMaxScaler(clip=True), "minmax"),
+    ("RobustScaler()", RobustScaler(), "generic"),
+    ("MaxAbsScaler()", MaxAbsScaler(), "generic"),
+]
+
+
+def readings(rng, n):
+    """Feature-like columns with distinct offsets and spreads; one is constant."""
+    loc = np.array([28.0, 65.0, 3.0, 400.0, 0.5])
+    spread = np.array([4.0, 15.0, 1.5, 250.0, 0.0])
+    return rng.normal(loc, spread, size=(n, N_FEATURES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--windows", type=int, default=64)
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    fit = readings(rng, 2_000)
+    # Wider than the fitted data, so clipping and extrapolation are exercised
+    windows = readings(rng, args.windows * SEQ_LEN).reshape(args.windows, SEQ_LEN, N_FEATURES) * 1.5
+
+    failures = 0
+    for label, scaler, expected_kind in CASES:
+        scaler.fit(fit)
+        fast = AffineScaler(scaler)
+        flat = windows.reshape(-1, N_FEATURES)
+
+        scaled = scaler.transform(flat).reshape(windows.shape)
+        restored = scaler.inverse_transform(scaled.reshape(-1, N_FEATURES)).reshape(windows.shape)
+        err_t = np.max(np.abs(fast.transform(windows) - scaled) / (1.0 + np.abs(scaled)))
+        err_i = np.max(np.abs(fast.inverse_transform(scaled) - restored) / (1.0 + np.abs(restored)))
+
+        ok = fast.kind == expected_kind and err_t <= args.rtol and err_i <= args.rtol
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {label:<50} {fast.kind:<9} "
+              f"transform {err_t:.1e}   inverse {err_i:.1e}")
+
+    if failures:
+        sys.exit(f"{failures} scaler configuration(s) differ from sklearn")
+
+
+if __name__ == "__main__":
+    main()
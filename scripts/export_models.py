@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Export the model server's LSTM state dicts to TorchScript and ONNX.
+
+Every <name>.pt in the model directory that loads into model_server's
+LSTMModel gets a <name>.ts.pt and a <name>.onnx next to it, checked
+against the eager model. Serve them with INFERENCE_BACKEND=torchscript
+or INFERENCE_BACKEND=onnx. ONNX export needs onnx and onnxscript.
+
+    python scripts/export_models.py [--model-dir data/models] [--formats torchscript,onnx]
+"""
+import argparse
+import glob
+import os
+import sys
+
+import numpy as np
+import torch
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("MODEL_DIR", os.path.normpath(os.path.join(ROOT, "data", "models")))
+
+import model_server as ms  # noqa: E402
+from inference_backends import (  # noqa: E402
+    OnnxRuntimeBackend, TorchBackend, TorchScriptBackend,
+    export_onnx, export_torchscript, onnx_path, torchscript_path,
+)
+
+
+def load_state_dict_model(path: str):
+    model = ms.LSTMModel(ms.N_FEATURES, ms.N_FEATURES)
+    model.load_state_dict(torch.load(path, map_location="cpu"))
+    return model.eval()
+
+
+def max_abs_diff(reference, backend, windows: np.ndarray) -> float:
+    return float(np.max(np.abs(backend(windows) - reference(windows))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model-dir", default=os.environ["MODEL_DIR"])
+    parser.add_argument("--formats", default="torchscript,onnx")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="max |exported - eager| allowed")
+    args = parser.parse_args()
+    formats = args.formats.split(",")
+
+    windows = np.random.default_rng(0).normal(size=(64, ms.SEQ_LEN, ms.N_FEATURES)).astype(np.float32)
+    failed = False
+
+    for path in sorted(glob.glob(os.path.join(args.model_dir, "*.pt"))):
+        if path.endswith(".ts.pt"):
+            continue
+        name = os.path.basename(path)[:-len(".pt")]
+        try:
+            model = load_state_dict_model(path)
+        except (RuntimeError, KeyError) as e:
+            print(f"{name}: skipped, not an LSTMModel state dict ({str(e).splitlines()[0]})")
+            continue
+
+        reference = TorchBackend(model)
+        for fmt in formats:
+            if fmt == "torchscript":
+                target = torchscript_path(args.model_dir, name)
+                export_torchscript(model, target)
+                backend = TorchScriptBackend(target)
+            elif fmt == "onnx":
+                target = onnx_path(args.model_dir, name)
+                export_onnx(model, target, ms.SEQ_LEN, ms.N_FEATURES)
+                backend = OnnxRuntimeBackend(target)
+            else:
+                sys.exit(f"Unknown format {fmt!r}")
+
+            diff = max(max_abs_diff(reference, backend, windows[:n]) for n in (1, 64))
+            ok = diff <= args.tolerance
+            failed |= not ok
+            print(f"{name}: {fmt:<12} {target}   max |diff| {diff:.2e}   {'ok' if ok else 'MISMATCH'}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
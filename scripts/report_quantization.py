@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Report what MODEL_QUANTIZATION=int8 costs and saves: forecast deviation from
+the float model, error against actuals, latency and weight size.
+
+Windows come from --readings (an NDJSON export of /api/v1/readings, or a
+CSV with the five feature columns) when given: every 24-hour input is
+paired with the 8 hours that followed it, so both models are also scored
+against what actually happened. Without it, synthetic windows are used and
+only the float/int8 deviation is reported.
+
+    MODEL_DIR=data/models python scripts/report_quantization.py [--readings readings.ndjson]
+"""
+import argparse
+import io
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+import torch
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("MODEL_DIR", os.path.join(ROOT, "data", "models"))
+
+import model_server as ms  # noqa: E402
+from inference_backends import TorchBackend  # noqa: E402
+from validate_incremental_lstm import synthetic_windows  # noqa: E402
+
+
+def file_windows(path: str, n: int):
+    """Up to n evenly spaced (24h input, 8h actuals) pairs from a readings file."""
+    if path.endswith((".ndjson", ".jsonl")):
+        df = pd.read_json(path, lines=True)
+    else:
+        df = pd.read_csv(path)
+    if "ts" in df:
+        df = df.dropna(subset=["ts"]).sort_values("ts")
+    values = df[ms.TARGETS].dropna().to_numpy(np.float32)
+
+    span = ms.SEQ_LEN + ms.FORECAST_STEPS
+    if len(values) < span:
+        sys.exit(f"{path} has {len(values)} complete readings, need at least {span}")
+    # (windows, 5, span) -> (windows, span, 5)
+    spans = np.lib.stride_tricks.sliding_window_view(values, span, axis=0).transpose(0, 2, 1)
+    spans = spans[np.linspace(0, len(spans) - 1, min(n, len(spans))).astype(int)]
+    return np.ascontiguousarray(spans[:, :ms.SEQ_LEN]), spans[:, ms.SEQ_LEN:]
+
+
+def state_dict_bytes(model) -> int:
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return buf.tell()
+
+
+def seeded(rollout, windows, seed=1234):
+    np.random.seed(seed)
+    return rollout.forecast(windows)
+
+
+def per_call(fn, iterations: int) -> float:
+    return min(timeit.repeat(fn, number=iterations, repeat=3)) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--readings", help="NDJSON or CSV readings held out from training")
+    parser.add_argument("--windows", type=int, default=512)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=1, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    if ms.fast_rollout is None:
+        sys.exit(f"Models not found in {ms.MODEL_DIR}; set MODEL_DIR")
+    torch.set_num_threads(args.threads)
+
+    if args.readings:
+        windows, actuals = file_windows(args.readings, args.windows)
+    else:
+        windows, actuals = synthetic_windows(args.windows, seed=0), None
+
+    backends = {"float32": TorchBackend(ms.lstm), "int8": TorchBackend(ms.lstm, "int8")}
+    rollouts = {k: ms.FastRollout(b, ms.x_scaler, ms.y_scaler, ms.lgb_models) for k, b in backends.items()}
+    preds = {k: seeded(r, windows) for k, r in rollouts.items()}
+
+    diff = np.abs(preds["int8"] - preds["float32"])
+    spread = np.std(preds["float32"], axis=(0, 1))
+    print(f"int8 vs float32 forecast over {len(windows)} windows:")
+    print(f"  {'target':<14} {'mean':>10} {'p95':>10} {'max':>10} {'mean/std':>10}")
+    for i, t in enumerate(ms.TARGETS):
+        d = diff[:, :, i]
+        print(f"  {t:<14} {d.mean():10.4f} {np.percentile(d, 95):10.4f} {d.max():10.4f} {d.mean() / spread[i]:10.4f}")
+
+    if actuals is not None:
+        print("\nMAE against actuals:")
+        print(f"  {'target':<14} {'float32':>10} {'int8':>10} {'change':>9}")
+        for i, t in enumerate(ms.TARGETS):
+            mae = {k: np.abs(p[:, :, i] - actuals[:, :, i]).mean() for k, p in preds.items()}
+            change = (mae["int8"] - mae["float32"]) / mae["float32"] * 100 if mae["float32"] else 0.0
+            print(f"  {t:<14} {mae['float32']:10.4f} {mae['int8']:10.4f} {change:+8.2f}%")
+
+    print("\nWeights:")
+    for k, b in backends.items():
+        print(f"  {k:<8} {state_dict_bytes(b.model) / 1024:8.1f} KiB")
+
+    print("\nLatency:")
+    scaled = ms.x_scaler.transform(windows[:32].reshape(-1, ms.N_FEATURES)).reshape(-1, ms.SEQ_LEN, ms.N_FEATURES)
+    scaled = scaled.astype(np.float32)
+    for k, b in backends.items():
+        single = per_call(lambda: b(scaled[:1]), args.iterations * 5)
+        batch = per_call(lambda: b(scaled), args.iterations)
+        forecast = per_call(lambda: rollouts[k].forecast(windows[:1]), args.iterations)
+        forecast_batch = per_call(lambda: rollouts[k].forecast(windows[:32]), max(args.iterations // 4, 10))
+        print(
+            f"  {k:<8} LSTM {single * 1e6:7.1f} µs (1) {batch * 1e3:6.2f} ms (32)   "
+            f"forecast {forecast * 1e3:6.2f} ms (1) {forecast_batch * 1e3:6.2f} ms (32)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Validate the incremental (stateful) LSTM rollout against the full-window one:
+per-target and per-step deviation of the 8-hour forecast, plus timing.
+
+The full-window path re-reads the last 24 hours at every step; the
+incremental path carries (h, c) forward, so from step 1 on it also still
+remembers the hours that slid out of the window. Step 0 must match exactly;
+later steps differ by however much the model depends on those hours.
+Both runs draw the same dynamics noise, so the deviations are the LSTM's.
+
+    MODEL_DIR=data/models python scripts/validate_incremental_lstm.py [--windows 512]
+
+Exits non-zero when the maximum temperature deviation exceeds --max-error
+(LSTM_INCREMENTAL_MAX_ERROR by default, the limit the model server applies
+at startup before it will enable LSTM_INCREMENTAL).
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import torch
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("MODEL_DIR", os.path.join(ROOT, "data", "models"))
+
+import model_server as ms  # noqa: E402
+from inference_backends import TorchBackend  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--windows", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=1, help="torch intra-op threads")
+    parser.add_argument("--max-error", type=float, default=ms.LSTM_INCREMENTAL_MAX_ERROR,
+                        help="maximum temperature deviation in °C")
+    args = parser.parse_args()
+
+    if ms.fast_rollout is None:
+        sys.exit(f"Models not found in {ms.MODEL_DIR}; set MODEL_DIR")
+    torch.set_num_threads(args.threads)
+
+    full = ms.FastRollout(TorchBackend(ms.lstm), ms.x_scaler, ms.y_scaler, ms.lgb_models)
+    incremental = ms.FastRollout(TorchBackend(ms.lstm), ms.x_scaler, ms.y_scaler, ms.lgb_models, incremental=True)
+
+    windows = ms.synthetic_windows(ms.x_scaler, args.windows, args.seed)
+    diff = ms.incremental_deviation(incremental, full, windows)
+    spread = np.std(full.forecast(windows), axis=(0, 1))
+
+    print(f"Deviation over {args.windows} windows (|incremental - full|):")
+    print(f"  {'target':<14} {'mean':>10} {'p95':>10} {'max':>10} {'mean/std':>10}")
+    for i, t in enumerate(ms.TARGETS):
+        d = diff[:, :, i]
+        print(f"  {t:<14} {d.mean():10.4f} {np.percentile(d, 95):10.4f} {d.max():10.4f} {d.mean() / spread[i]:10.4f}")
+
+    print("\nMean deviation by forecast step:")
+    for step in range(ms.FORECAST_STEPS):
+        row = "  ".join(f"{diff[:, step, i].mean():8.4f}" for i in range(ms.N_FEATURES))
+        print(f"  +{step + 1}h  {row}")
+
+    print("\nTime per forecast:")
+    for n in (1, 32):
+        batch = windows[:n]
+        t_full = timeit.timeit(lambda: full.forecast(batch), number=args.iterations) / args.iterations
+        t_inc = timeit.timeit(lambda: incremental.forecast(batch), number=args.iterations) / args.iterations
+        print(f"  batch {n:<4} full {t_full * 1e3:7.2f} ms   incremental {t_inc * 1e3:7.2f} ms   {t_full / t_inc:.2f}x")
+
+    if diff[:, 0].max() > 1e-4:
+        sys.exit("Step 0 differs: the incremental path is not reading the same window")
+    error = diff[..., 0].max()
+    if error > args.max_error:
+        sys.exit(f"Temperature deviates up to {error:.2f} °C (limit {args.max_error}): "
+                 "LSTM_INCREMENTAL must stay off for this model")
+    print(f"\nOK: temperature deviation at most {error:.2f} °C (limit {args.max_error})")
+
+
+if __name__ == "__main__":
+    main()